@@ -0,0 +1,233 @@
+"""Application factory.
+
+`create_app(config)` only records the config.  The bot, dispatcher (with
+the handler routers), database pool and background services are built on
+first use, so importing this module or creating an App touches neither the
+network nor the environment, and a router-mode process never builds the
+database side at all.  `startup()` opens the database and starts the
+background tasks; `shutdown()` stops whatever was started.
+"""
+from functools import cached_property
+
+from aiogram import Bot, Dispatcher
+from aiogram.methods import DeleteMessage
+
+from database import Database
+from digests import DigestService
+from fsm_storage import BoundedMemoryStorage, SQLiteStorage
+from groups import GroupRegistry
+from metrics import Metrics
+from middlewares import (
+    ApiMetricsMiddleware,
+    HandlerMetricsMiddleware,
+    LogContextMiddleware,
+    PerUserOrderMiddleware,
+    ThrottlingMiddleware,
+    UpdateMetricsMiddleware,
+)
+from migrations import run_migrations
+from outbox import Outbox
+from profiles import ProfileCache
+from reminders import TopicReminders
+from scheduler import Scheduler
+from stats import create_stats_tables
+from submissions import SubmissionStore
+from teachers import TeacherRegistry
+
+
+class App:
+    """Services shared by the handlers, which receive it as their `app` argument."""
+
+    def __init__(self, config):
+        self.config = config
+
+    @cached_property
+    def metrics(self):
+        metrics = Metrics()
+        metrics.register("bot_outbox_depth", "Bot API calls queued in the outbox", lambda: self.outbox.depth)
+        for counter in ("sent", "retried", "rate_limited", "failed"):
+            metrics.register(
+                f"bot_outbox_{counter}_total", f"Outbox jobs {counter.replace('_', ' ')}",
+                lambda counter=counter: self.outbox.counters[counter], kind="counter"
+            )
+        metrics.register("bot_scheduler_pending", "Delayed jobs waiting in this process", lambda: self.scheduler.pending)
+        return metrics
+
+    @cached_property
+    def database(self):
+        return Database(
+            self.config.db_path, size=self.config.db_pool_size, busy_timeout=self.config.db_busy_timeout,
+            on_query=self.metrics.observe_query, on_acquire=self.metrics.observe_pool_wait
+        )
+
+    @cached_property
+    def submissions(self):
+        return SubmissionStore(self.database, ttl=self.config.submission_ttl_days * 24 * 3600)
+
+    @cached_property
+    def group_registry(self):
+        return GroupRegistry(self.database)
+
+    @cached_property
+    def teachers(self):
+        return TeacherRegistry(self.database, self.config.teacher_id)
+
+    @cached_property
+    def profiles(self):
+        return ProfileCache(self.database, max_entries=self.config.user_cache_size, ttl=self.config.user_cache_ttl)
+
+    @cached_property
+    def fsm_storage(self):
+        ttl = self.config.fsm_ttl_hours * 3600
+        # The router only forwards updates, so its dispatcher never stores state
+        if self.config.fsm_storage == "sqlite" and self.config.bot_mode != "router":
+            return SQLiteStorage(self.database, ttl=ttl)
+        return BoundedMemoryStorage(max_entries=self.config.fsm_max_entries, ttl=ttl)
+
+    @cached_property
+    def bot(self):
+        bot = Bot(token=self.config.token)
+        bot.session.middleware(ApiMetricsMiddleware(self.metrics))
+        return bot
+
+    @cached_property
+    def throttling(self):
+        return ThrottlingMiddleware(max_users=self.config.fsm_max_entries, metrics=self.metrics)
+
+    @cached_property
+    def outbox(self):
+        return Outbox(self.bot, global_rate=self.config.outbox_global_rate)
+
+    @cached_property
+    def scheduler(self):
+        scheduler = Scheduler(self.database)
+        scheduler.register("delete_message", self._delete_message_job)
+        scheduler.register("digest_build", self._digest_build_job)
+        scheduler.register("digest_send", self._digest_send_job)
+        scheduler.register("topic_sweep", self._topic_sweep_job)
+        return scheduler
+
+    async def _delete_message_job(self, payload):
+        self.outbox.enqueue(DeleteMessage(chat_id=payload["chat_id"], message_id=payload["message_id"]))
+
+    async def _digest_build_job(self, payload):
+        await self.digests.build(payload)
+
+    async def _digest_send_job(self, payload):
+        await self.digests.send(payload)
+
+    async def _topic_sweep_job(self, payload):
+        await self.reminders.sweep(payload)
+
+    @cached_property
+    def digests(self):
+        return DigestService(
+            self.database, self.group_registry, self.teachers, self.outbox, self.scheduler,
+            build_hour=self.config.digest_build_hour, send_hour=self.config.digest_send_hour
+        )
+
+    @cached_property
+    def reminders(self):
+        return TopicReminders(
+            self.database, self.outbox, self.profiles, self.scheduler,
+            remind_after=self.config.topic_remind_hours * 3600,
+            expire_after=self.config.topic_expire_hours * 3600,
+            batch_size=self.config.reminder_batch_size
+        )
+
+    @cached_property
+    def dp(self):
+        from handlers import create_routers
+
+        dp = Dispatcher(storage=self.fsm_storage, app=self)
+        dp.update.outer_middleware(LogContextMiddleware())
+        dp.update.outer_middleware(UpdateMetricsMiddleware(self.metrics))
+        dp.update.outer_middleware(PerUserOrderMiddleware())
+        # Outer so spam is dropped before FSM filters and handlers touch the database
+        dp.message.outer_middleware(self.throttling)
+        dp.message.middleware(HandlerMetricsMiddleware(self.metrics))
+        dp.callback_query.middleware(HandlerMetricsMiddleware(self.metrics))
+        dp.include_routers(*create_routers())
+        return dp
+
+    async def init_db(self):
+        async with self.database.acquire() as db:
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id INTEGER PRIMARY KEY,
+                full_name TEXT NOT NULL,
+                username TEXT,
+                group_name TEXT NOT NULL,
+                current_topic TEXT
+            )
+            """)
+
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS grades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                topic TEXT NOT NULL,
+                grade INTEGER NOT NULL,
+                feedback TEXT,
+                date INTEGER NOT NULL,
+                FOREIGN KEY (user_id) REFERENCES users(user_id)
+            )
+            """)
+
+            await db.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                topic TEXT NOT NULL,
+                forwarded_msg_id INTEGER NOT NULL,
+                info_msg_id INTEGER NOT NULL,
+                created_at INTEGER NOT NULL,
+                teacher_id INTEGER,
+                PRIMARY KEY (chat_id, message_id)
+            )
+            """)
+
+            await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_created_at ON submissions (created_at)
+            """)
+            await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_teacher ON submissions (teacher_id, created_at)
+            """)
+            await db.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_user ON submissions (user_id)
+            """)
+
+            await create_stats_tables(db)
+
+            await db.commit()
+
+            await run_migrations(db)
+
+    async def startup(self):
+        """Open the database, load the registries and start the outbox, scheduler and periodic jobs."""
+        await self.database.open()
+        await self.init_db()
+        await self.group_registry.load(self.config.default_groups)
+        await self.teachers.load()
+        await self.submissions.recover()
+        self.outbox.start()
+        await self.scheduler.recover()
+        await self.digests.ensure_scheduled()
+        await self.reminders.ensure_scheduled()
+        self.scheduler.start()
+        if isinstance(self.fsm_storage, SQLiteStorage):
+            await self.fsm_storage.purge_expired()
+
+    async def shutdown(self):
+        # Only what was actually built; an App that never started has nothing to stop
+        if "scheduler" in self.__dict__:
+            await self.scheduler.stop()
+        if "outbox" in self.__dict__:
+            await self.outbox.stop()
+        if "database" in self.__dict__:
+            await self.database.close()
+
+
+def create_app(config):
+    return App(config)
@@ -0,0 +1,111 @@
+"""Per-update DB latency: connect-per-handler (old main.py) vs the shared pool.
+
+Usage: python benchmarks/bench_db.py [updates] [concurrency]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from database import Database  # noqa: E402
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY,
+        full_name TEXT NOT NULL,
+        username TEXT,
+        group_name TEXT NOT NULL,
+        current_topic TEXT
+    )""",
+    """CREATE TABLE IF NOT EXISTS grades (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        topic TEXT NOT NULL,
+        grade INTEGER NOT NULL,
+        feedback TEXT,
+        date TIMESTAMP NOT NULL
+    )""",
+]
+STUDENTS = 500
+
+
+async def seed(path):
+    async with aiosqlite.connect(path) as db:
+        for statement in SCHEMA:
+            await db.execute(statement)
+        await db.executemany(
+            "INSERT INTO users VALUES (?, ?, ?, ?, ?)",
+            [(i, f"Student {i}", None, "101", "topic") for i in range(STUDENTS)],
+        )
+        await db.commit()
+
+
+async def update_work(db, user_id):
+    # Mirrors handle_video (lookup) followed by process_grade (write + stats)
+    async with db.execute(
+        "SELECT full_name, group_name, current_topic FROM users WHERE user_id = ?", (user_id,)
+    ) as cursor:
+        await cursor.fetchone()
+    await db.execute(
+        "INSERT INTO grades (user_id, topic, grade, date) VALUES (?, ?, ?, ?)",
+        (user_id, "topic", 5, datetime.now().isoformat()),
+    )
+    await db.commit()
+    async with db.execute("SELECT COUNT(*) FROM grades WHERE user_id = ?", (user_id,)) as cursor:
+        await cursor.fetchone()
+
+
+async def run(label, updates, concurrency, handler):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(i % STUDENTS)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(updates)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<22} mean {statistics.mean(latencies):7.2f} ms  "
+        f"p95 {p95:7.2f} ms  {updates / elapsed:8.1f} updates/s"
+    )
+
+
+async def main(updates=2000, concurrency=16):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        await seed(path)
+
+        async def connect_per_update(user_id):
+            async with aiosqlite.connect(path) as db:
+                await update_work(db, user_id)
+
+        await run("connect-per-update", updates, concurrency, connect_per_update)
+
+        database = Database(path)
+        await database.open()
+
+        async def pooled(user_id):
+            async with database.acquire() as db:
+                await update_work(db, user_id)
+
+        try:
+            await run("pooled (WAL)", updates, concurrency, pooled)
+        finally:
+            await database.close()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    asyncio.run(main(*args))
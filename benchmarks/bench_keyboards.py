@@ -0,0 +1,70 @@
+"""Per-update cost of building and serializing inline keyboards.
+
+Compares rebuilding markups on every call (the old main.py behaviour) with
+the memoized/templated factories in keyboards.py.
+
+Usage: python benchmarks/bench_keyboards.py [iterations] [groups]
+"""
+import os
+import sys
+import timeit
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import keyboards  # noqa: E402
+
+
+def rebuild_statistics_keyboard(groups):
+    keyboard = []
+    row = []
+    for i, group in enumerate(groups):
+        row.append(InlineKeyboardButton(text=group, callback_data=f"stats_{group}"))
+        if len(row) == 3 or i == len(groups) - 1:
+            keyboard.append(row)
+            row = []
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def rebuild_grade_keyboard(chat_id, message_id):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text=f"{i} ⭐️", callback_data=f"grade_{chat_id}_{message_id}_{i}")
+                for i in range(5, 0, -1)
+            ]
+        ]
+    )
+
+
+def main(iterations=20000, group_count=5):
+    groups = tuple(str(100 + i) for i in range(group_count))
+    session = AiohttpSession()
+    bot = Bot(token="123456:benchmark", session=session)
+
+    def serialize(markup):
+        return session.prepare_value(markup, bot=bot, files={})
+
+    assert serialize(rebuild_grade_keyboard(7, 42)) == serialize(keyboards.create_grade_keyboard(7, 42))
+    assert serialize(rebuild_statistics_keyboard(groups)) == serialize(
+        keyboards.create_statistics_keyboard(groups)
+    )
+
+    cases = [
+        ("stats keyboard, rebuilt", lambda: rebuild_statistics_keyboard(groups)),
+        ("stats keyboard, cached", lambda: keyboards.create_statistics_keyboard(groups)),
+        ("grade keyboard, validated", lambda: rebuild_grade_keyboard(7, 42)),
+        ("grade keyboard, template", lambda: keyboards.create_grade_keyboard(7, 42)),
+        ("stats keyboard, serialize", lambda: serialize(keyboards.create_statistics_keyboard(groups))),
+        ("grade keyboard, serialize", lambda: serialize(keyboards.create_grade_keyboard(7, 42))),
+    ]
+    for name, case in cases:
+        seconds = timeit.timeit(case, number=iterations)
+        print(f"{name:<28} {seconds / iterations * 1e6:8.2f} µs/update")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:3]]
+    main(*args)
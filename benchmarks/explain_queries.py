@@ -0,0 +1,122 @@
+"""Assert the bot's hot queries are served by the migration indexes.
+
+Builds a throwaway database with App.init_db(), runs EXPLAIN QUERY PLAN on
+each statement, imported from the module that runs it, and fails if the
+expected index is not used.  It also runs migration 2 on grades stored the
+way the pre-migration bot stored them (ISO-8601 with the Tashkent offset)
+and checks the epoch seconds it produces.
+
+Usage: python benchmarks/explain_queries.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DAY_RANGE = ("2026-01-01", "2026-01-31")
+
+# grades.date as written by datetime.now(tz).isoformat() before migration 2
+LEGACY_DATES = (
+    "2025-03-01T09:15:30.123456+05:00",
+    "2025-12-31T23:59:59+05:00",
+    "2026-01-01T00:00:00+05:00",
+)
+
+
+def checks(app):
+    """(name, (sql, params), expected index) for the statements the bot runs."""
+    from export import export_query
+    from handlers.statistics import monthly_filter
+    from reminders import EXPIRE_TOPICS, REMIND_TOPICS
+    from stats import REBUILD_STUDENT_STATS, group_students_query, range_stats_query, student_range_query
+
+    def export(groups):
+        where, params = monthly_filter(groups, (2026, 1))
+        return export_query(where), params
+
+    return [
+        ("student stats rebuild", (REBUILD_STUDENT_STATS, ()), "idx_grades_user_grade"),
+        ("export month, every group", export(None), "idx_grades_date_user_grade"),
+        ("export month, one group", export(("101",)), "idx_grades_user_grade"),
+        ("range stats, every group", range_stats_query(*DAY_RANGE), "idx_daily_rollup_day_group"),
+        ("range stats, one group", range_stats_query(*DAY_RANGE, ("101",)), "idx_daily_rollup_day_group"),
+        ("group students over a range", student_range_query(*DAY_RANGE, "101"), "idx_daily_rollup_day_group"),
+        (
+            "group students over a range, next chunk",
+            student_range_query(*DAY_RANGE, "101", (4.5, 3, 1), 50),
+            "idx_daily_rollup_day_group",
+        ),
+        ("group students, all time", group_students_query("101"), "idx_users_group_name"),
+        ("group students, next chunk", group_students_query("101", (4.5, 3, 1), 50), "idx_users_group_name"),
+        ("/queue, head teacher", app.submissions.pending_query(0, 5), "idx_submissions_created_at"),
+        ("/queue, one teacher", app.submissions.pending_query(0, 5, 1), "idx_submissions_teacher"),
+        ("expire topics", (EXPIRE_TOPICS, (0, 200)), "idx_users_topic_set_at"),
+        ("remind topics", (REMIND_TOPICS, (0, 0, 0, 200)), "idx_users_topic_set_at"),
+    ]
+
+
+async def check_epoch_conversion(path):
+    """Run migration 2 on a pre-migration grades table; returns the number of wrong dates."""
+    import aiosqlite
+
+    from migrations import MIGRATIONS
+
+    migrate = {version: step for version, _, step in MIGRATIONS}[2]
+    async with aiosqlite.connect(path) as db:
+        await db.execute("""
+            CREATE TABLE grades (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                topic TEXT NOT NULL,
+                grade INTEGER NOT NULL,
+                feedback TEXT,
+                date TIMESTAMP NOT NULL
+            )
+        """)
+        await db.executemany(
+            "INSERT INTO grades (user_id, topic, grade, date) VALUES (1, 'legacy', 5, ?)",
+            [(date,) for date in LEGACY_DATES]
+        )
+        await migrate(db)
+        async with db.execute("SELECT date FROM grades ORDER BY id") as cursor:
+            converted = [row[0] for row in await cursor.fetchall()]
+
+    failures = 0
+    for legacy, epoch in zip(LEGACY_DATES, converted):
+        expected = int(datetime.fromisoformat(legacy).timestamp())
+        ok = epoch == expected
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} epoch of {legacy}: {epoch!r} (expected {expected})")
+    return failures
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        from app import create_app
+        from config import Config
+
+        app = create_app(Config(token="123456:explain", teacher_id=1, db_path=os.path.join(tmp, "explain.db")))
+
+        await app.database.open()
+        failures = 0
+        try:
+            await app.init_db()
+            async with app.database.acquire() as db:
+                for name, (query, params), index in checks(app):
+                    async with db.execute(f"EXPLAIN QUERY PLAN {query}", params) as cursor:
+                        plan = [row[3] for row in await cursor.fetchall()]
+                    ok = any(index in detail for detail in plan)
+                    failures += not ok
+                    print(f"{'OK  ' if ok else 'FAIL'} {name}: {' | '.join(plan)}")
+        finally:
+            await app.database.close()
+        failures += await check_epoch_conversion(os.path.join(tmp, "legacy.db"))
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,348 @@
+"""Replay realistic update streams through the bot against a fake Bot API server.
+
+Usage:
+
+    python benchmarks/load_test.py [--students N] [--concurrency C] [--api-latency MS]
+                                   [--flood K] [--stats-every S] [--fsm memory|sqlite]
+                                   [--keep-rate-limits]
+
+The bot is built with create_app() on a throwaway database and its session
+is pointed at a local aiohttp server that answers every Bot API method the
+way Telegram would (with an optional delay), so nothing leaves the machine.
+Updates are fed straight into the dispatcher; each user's updates are sent
+in order and different users run concurrently, as they would behind the
+webhook.
+
+Phases:
+
+    registration  every student runs /start, name, group and topic
+    video flood   every student sends a video note plus K spam/duplicate ones
+    grading       the teacher grades all pending videos, with a stats click
+                  every S grades, while students submit a second round
+
+Throttling windows are cleared between phases, as if time had passed.
+
+For each phase it prints updates/s, per-handler p50/p95/p99 latency, the
+connection pool wait and SQLite time spent per handler (DB contention) and
+handler errors such as "database is locked".  The outbox rate limits are
+lifted unless --keep-rate-limits is given, so the numbers show what the bot
+itself can handle rather than Telegram's per-chat limits.
+"""
+import argparse
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TEACHER_ID = 1
+MESSAGE_METHODS = {"sendMessage", "forwardMessage", "editMessageText", "sendDocument", "copyMessage"}
+
+_ids = itertools.count(1)
+current_handler = contextvars.ContextVar("current_handler", default="(background)")
+
+
+class FakeBotAPI:
+    """Answers /bot<token>/<method> like Telegram, after `latency` seconds."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+        self._message_ids = itertools.count(1_000_000)
+        self._runner = None
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        data = await request.post()
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method in MESSAGE_METHODS:
+            chat_id = int(data.get("chat_id") or 0)
+            result = {
+                "message_id": int(data.get("message_id") or next(self._message_ids)),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": data.get("text") or "",
+            }
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+class Recorder:
+    """Raw per-handler samples: latency, pool wait, SQLite time and errors."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.handler_times = defaultdict(list)
+        self.pool_waits = defaultdict(list)
+        self.query_times = defaultdict(float)
+        self.errors = Counter()
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        token = current_handler.set(name)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.errors[name, type(e).__name__] += 1
+            raise
+        finally:
+            self.handler_times[name].append(time.perf_counter() - started)
+            current_handler.reset(token)
+
+    def hook(self, database):
+        on_acquire, on_query = database.on_acquire, database.on_query
+
+        def acquired(seconds):
+            self.pool_waits[current_handler.get()].append(seconds)
+            if on_acquire:
+                on_acquire(seconds)
+
+        def queried(sql, seconds):
+            self.query_times[current_handler.get()] += seconds
+            if on_query:
+                on_query(sql, seconds)
+
+        database.on_acquire, database.on_query = acquired, queried
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def message(user_id, text=None, video_note=None):
+    message_id = next(_ids)
+    payload = {
+        "message_id": message_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"Student {user_id}"},
+    }
+    if video_note:
+        payload["video_note"] = {
+            "file_id": f"vn{message_id}", "file_unique_id": video_note, "length": 240, "duration": 30,
+        }
+    else:
+        payload["text"] = text
+        if text.startswith("/"):
+            payload["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+    return {"update_id": message_id, "message": payload}
+
+
+def callback(user_id, data, text="Baho qo'yish uchun tanlang:"):
+    update_id = next(_ids)
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id),
+        "from": {"id": user_id, "is_bot": False, "first_name": "Teacher"},
+        "chat_instance": "bench",
+        "data": data,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "text": text,
+        },
+    }}
+
+
+def registration_streams(students, groups):
+    for user_id in students:
+        group = groups[user_id % len(groups)]
+        yield [
+            lambda u=user_id: message(u, "/start"),
+            lambda u=user_id: message(u, f"Student {u}"),
+            lambda u=user_id, g=group: callback(u, f"group_{g}"),
+            lambda u=user_id, g=group: callback(u, f"confirm_group_{g}"),
+            lambda u=user_id: message(u, f"Topic {u}"),
+        ]
+
+
+def video_streams(students, flood, round_=1):
+    for user_id in students:
+        stream = [] if round_ == 1 else [
+            lambda u=user_id: message(u, "/start"),
+            lambda u=user_id: message(u, f"Topic {u} round {round_}"),
+        ]
+        stream.append(lambda u=user_id: message(u, video_note=f"vn-{u}-{round_}"))
+        for i in range(flood):
+            # Alternate resends of the same video with new ones
+            fuid = f"vn-{user_id}-{round_}" if i % 2 == 0 else f"vn-{user_id}-{round_}-{i}"
+            stream.append(lambda u=user_id, f=fuid: message(u, video_note=f))
+        yield stream
+
+
+def teacher_stream(pending, groups, stats_every):
+    clicks = itertools.cycle([
+        lambda: callback(TEACHER_ID, f"stats_{random.choice(groups)}", "Statistika"),
+        lambda: message(TEACHER_ID, "/stats"),
+        lambda: callback(TEACHER_ID, "monthly_all", "Oylik statistika"),
+        lambda: message(TEACHER_ID, "/stats week"),
+        lambda: callback(TEACHER_ID, f"monthly_group_{random.choice(groups)}", "Oylik statistika"),
+    ])
+    stream = []
+    for i, (chat_id, message_id) in enumerate(pending, 1):
+        stream.append(lambda c=chat_id, m=message_id: callback(TEACHER_ID, f"grade_{c}_{m}_{random.randint(1, 5)}"))
+        if stats_every and i % stats_every == 0:
+            stream.append(next(clicks))
+    return stream
+
+
+async def replay(app, streams, concurrency):
+    """Feed each stream in order, up to `concurrency` streams at once."""
+    from aiogram.types import Update
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failed = 0
+
+    async def run_stream(stream):
+        nonlocal failed
+        async with semaphore:
+            for make in stream:
+                update = Update.model_validate(make(), context={"bot": app.bot})
+                started = time.perf_counter()
+                try:
+                    await app.dp.feed_update(app.bot, update)
+                except Exception:
+                    failed += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(run_stream(stream) for stream in streams))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed, failed
+
+
+async def drain(app):
+    while app.outbox.depth:
+        await asyncio.sleep(0.01)
+
+
+def report(name, latencies, elapsed, failed, recorder, api, api_before, throttled):
+    ms = 1000
+    print(f"\n== {name}: {len(latencies)} updates in {elapsed:.2f}s, "
+          f"{len(latencies) / elapsed:.1f} updates/s, {failed} failed")
+    if latencies:
+        print(f"   update latency  p50 {percentile(latencies, 0.5) * ms:7.2f}  "
+              f"p95 {percentile(latencies, 0.95) * ms:7.2f}  p99 {percentile(latencies, 0.99) * ms:7.2f} ms")
+    print(f"   {'handler':<28}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"{'pool p95':>10}{'pool max':>10}{'db ms/call':>12}")
+    names = sorted(recorder.handler_times, key=lambda n: -len(recorder.handler_times[n]))
+    for handler in names + [n for n in recorder.pool_waits if n not in recorder.handler_times]:
+        times = recorder.handler_times.get(handler, [])
+        waits = recorder.pool_waits.get(handler, [])
+        calls = len(times) or len(waits)
+        row = f"   {handler:<28}{calls:>7}"
+        row += "".join(f"{percentile(times, q) * ms:9.2f}" for q in (0.5, 0.95, 0.99)) if times else " " * 27
+        row += f"{percentile(waits, 0.95) * ms:10.2f}{max(waits) * ms:10.2f}" if waits else " " * 20
+        row += f"{recorder.query_times.get(handler, 0) / calls * ms:12.2f}"
+        print(row)
+    for (handler, error), count in sorted(recorder.errors.items()):
+        print(f"   error: {handler} {error} x{count}")
+    if throttled:
+        print(f"   dropped by throttling: {throttled}")
+    calls = api.calls - api_before
+    print("   Bot API calls: " + ", ".join(f"{m} {n}" for m, n in calls.most_common()))
+
+
+async def run(args):
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from app import create_app
+    from config import Config
+
+    tmp = tempfile.mkdtemp(prefix="bot-load-")
+    app = create_app(Config(
+        token="123456:LOAD-TEST",
+        teacher_id=TEACHER_ID,
+        db_path=os.path.join(tmp, "load.db"),
+        fsm_storage=args.fsm,
+        outbox_global_rate=int(os.environ.get("OUTBOX_GLOBAL_RATE", "25")) if args.keep_rate_limits else 100000,
+    ))
+
+    api = FakeBotAPI(args.api_latency / 1000)
+    app.bot.session.api = TelegramAPIServer.from_base(await api.start())
+    if not args.keep_rate_limits:
+        app.outbox.per_chat_rate = app.outbox.per_chat_burst = 100000
+
+    recorder = Recorder()
+    recorder.hook(app.database)
+    app.dp.message.middleware(recorder)
+    app.dp.callback_query.middleware(recorder)
+
+    await app.startup()
+
+    groups = list(await app.group_registry.active())
+    students = range(100000, 100000 + args.students)
+    try:
+        phases = [
+            ("registration", lambda: list(registration_streams(students, groups))),
+            ("video flood", lambda: list(video_streams(students, args.flood))),
+        ]
+        for name, build in phases:
+            recorder.reset()
+            before, throttled = api.calls.copy(), app.metrics.throttled.total()
+            latencies, elapsed, failed = await replay(app, build(), args.concurrency)
+            await drain(app)
+            report(name, latencies, elapsed, failed, recorder, api, before,
+                   app.metrics.throttled.total() - throttled)
+            app.throttling.clear()
+
+        pending = await app.database.fetchall(
+            "SELECT chat_id, message_id FROM submissions ORDER BY created_at"
+        )
+        recorder.reset()
+        before, throttled = api.calls.copy(), app.metrics.throttled.total()
+        streams = [teacher_stream(pending, groups, args.stats_every)]
+        streams += video_streams(students, 0, round_=2)
+        latencies, elapsed, failed = await replay(app, streams, args.concurrency)
+        await drain(app)
+        report(f"grading {len(pending)} videos + second round", latencies, elapsed, failed, recorder, api, before,
+               app.metrics.throttled.total() - throttled)
+    finally:
+        await app.shutdown()
+        await app.bot.session.close()
+        await api.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--api-latency", type=float, default=30, help="fake Bot API delay in ms")
+    parser.add_argument("--flood", type=int, default=5, help="extra video notes per student")
+    parser.add_argument("--stats-every", type=int, default=10, help="stats click every N grades")
+    parser.add_argument("--fsm", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--keep-rate-limits", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(run(args))
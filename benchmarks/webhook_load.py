@@ -0,0 +1,101 @@
+"""POST synthetic Telegram updates to a local webhook server.
+
+Start the bot in webhook mode without registering it with Telegram:
+
+    BOT_MODE=webhook WEBHOOK_PORT=8080 python main.py
+
+then run:
+
+    python benchmarks/webhook_load.py [--url URL] [--updates N] [--concurrency C]
+
+Reports accepted updates per second and request latency.  Outbound Bot API
+calls made by the handlers still go to Telegram, so expect them to fail
+unless the bot is pointed at a stand-in server.
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+
+import aiohttp
+
+_update_ids = itertools.count(1)
+
+
+def make_message_update(user_id, text=None, video_note=False):
+    update_id = next(_update_ids)
+    message = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": {"id": user_id, "type": "private"},
+        "from": {"id": user_id, "is_bot": False, "first_name": f"Student {user_id}"},
+    }
+    if video_note:
+        message["video_note"] = {
+            "file_id": f"vn{update_id}",
+            "file_unique_id": f"vnu{update_id}",
+            "length": 240,
+            "duration": 30,
+        }
+    else:
+        message["text"] = text
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text)}]
+    return {"update_id": update_id, "message": message}
+
+
+def make_update(i, students):
+    user_id = 100000 + i % students
+    kind = i % 4
+    if kind == 0:
+        return make_message_update(user_id, "/start")
+    if kind == 1:
+        return make_message_update(user_id, f"Topic {i}")
+    if kind == 2:
+        return make_message_update(user_id, video_note=True)
+    return make_message_update(user_id, "/help")
+
+
+async def main(url, updates, concurrency, students, secret):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        health_url = url.rsplit("/", 1)[0] + "/health"
+        async with session.get(health_url) as response:
+            print(f"health: {response.status} {await response.text()}")
+
+        async def post(i):
+            nonlocal errors
+            async with semaphore:
+                start = time.perf_counter()
+                async with session.post(url, json=make_update(i, students)) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(i) for i in range(updates)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(
+        f"{updates} updates in {elapsed:.2f}s: {updates / elapsed:.1f} updates/s, "
+        f"mean {statistics.mean(latencies):.2f} ms, "
+        f"p95 {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms, errors {errors}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--updates", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--students", type=int, default=150)
+    parser.add_argument("--secret", default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.updates, args.concurrency, args.students, args.secret))
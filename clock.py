@@ -0,0 +1,83 @@
+"""Tashkent wall-clock time and the current calendar periods.
+
+Everything that needs local time uses the one `TASHKENT` tzinfo from here.
+`current_period()` returns the Tashkent day, week and month containing the
+present moment with their boundaries precomputed as epoch seconds; the same
+object is handed out until midnight, so handlers and stats queries agree on
+"today" and "this month" without building datetimes on every update.
+"""
+import time
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+
+TASHKENT = ZoneInfo("Asia/Tashkent")
+
+
+def _midnight(day):
+    return int(datetime(day.year, day.month, day.day, tzinfo=TASHKENT).timestamp())
+
+def _next_month(year, month):
+    return date(year + month // 12, month % 12 + 1, 1)
+
+@lru_cache(maxsize=64)
+def month_bounds(year, month):
+    """Epoch seconds of the start of (year, month) and of the month after it."""
+    return _midnight(date(year, month, 1)), _midnight(_next_month(year, month))
+
+@lru_cache(maxsize=64)
+def month_days(year, month):
+    """First and last "YYYY-MM-DD" day of (year, month), as daily_rollup stores them."""
+    last = _next_month(year, month) - timedelta(days=1)
+    return date(year, month, 1).isoformat(), last.isoformat()
+
+def day_end(day):
+    """Epoch seconds of the midnight that ends the "YYYY-MM-DD" day."""
+    return _midnight(date.fromisoformat(day) + timedelta(days=1))
+
+
+class Period:
+    """The Tashkent day, week (from Monday) and month containing `timestamp`.
+
+    `*_start` is inclusive and `*_end` exclusive, both in epoch seconds.
+    """
+    __slots__ = (
+        "today", "day", "day_start", "day_end", "week_start", "week_end",
+        "year", "month", "month_start", "month_end", "month_first_day", "month_last_day", "month_name",
+    )
+
+    def __init__(self, timestamp):
+        local = datetime.fromtimestamp(timestamp, TASHKENT)
+        self.today = local.date()
+        self.day = self.today.isoformat()
+        self.day_start = _midnight(self.today)
+        self.day_end = _midnight(self.today + timedelta(days=1))
+        monday = self.today - timedelta(days=self.today.weekday())
+        self.week_start = _midnight(monday)
+        self.week_end = _midnight(monday + timedelta(days=7))
+        self.year, self.month = local.year, local.month
+        self.month_start, self.month_end = month_bounds(self.year, self.month)
+        self.month_first_day, self.month_last_day = month_days(self.year, self.month)
+        self.month_name = local.strftime("%B %Y")
+
+    def days_ago(self, days):
+        """"YYYY-MM-DD" of the Tashkent day `days` before today."""
+        return (self.today - timedelta(days=days)).isoformat()
+
+
+_current = None
+
+def current_period():
+    global _current
+    now = time.time()
+    period = _current
+    # Also rebuilt if the system clock is set back past midnight
+    if period is None or not period.day_start <= now < period.day_end:
+        period = _current = Period(now)
+    return period
+
+def now():
+    return datetime.now(TASHKENT)
+
+def utcnow():
+    return datetime.now(timezone.utc)
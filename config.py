@@ -0,0 +1,151 @@
+"""Bot settings, read and validated once.
+
+`Config.from_env()` parses the environment (main.py loads .env first) and
+raises ConfigError with a readable message; nothing else reads os.environ.
+Tests and benchmarks can build a Config directly.
+"""
+import logging
+import os
+from dataclasses import dataclass, fields
+
+# Seeds the groups table on first start; manage groups with /addgroup etc. afterwards
+DEFAULT_GROUPS = (
+    "101", "102", "103",
+    "104", "202",
+)
+
+# Integer settings: env var -> Config field (defaults come from the field)
+_INT_SETTINGS = {
+    "DB_POOL_SIZE": "db_pool_size",
+    "DB_BUSY_TIMEOUT": "db_busy_timeout",
+    "SUBMISSION_TTL_DAYS": "submission_ttl_days",
+    "WEBHOOK_PORT": "webhook_port",
+    "FSM_TTL_HOURS": "fsm_ttl_hours",
+    "FSM_MAX_ENTRIES": "fsm_max_entries",
+    "OUTBOX_GLOBAL_RATE": "outbox_global_rate",
+    "METRICS_PORT": "metrics_port",
+    "LOG_MAX_BYTES": "log_max_bytes",
+    "LOG_BACKUP_COUNT": "log_backup_count",
+    "USER_CACHE_SIZE": "user_cache_size",
+    "USER_CACHE_TTL": "user_cache_ttl",
+    "DIGEST_BUILD_HOUR": "digest_build_hour",
+    "DIGEST_SEND_HOUR": "digest_send_hour",
+    "TOPIC_REMIND_HOURS": "topic_remind_hours",
+    "TOPIC_EXPIRE_HOURS": "topic_expire_hours",
+    "REMINDER_BATCH_SIZE": "reminder_batch_size",
+}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Config:
+    token: str
+    teacher_id: int
+    db_path: str = "mydatabase.db"
+    db_pool_size: int = 4
+    db_busy_timeout: int = 5000
+    submission_ttl_days: int = 14
+    fsm_storage: str = "memory"
+    fsm_ttl_hours: int = 24
+    fsm_max_entries: int = 10000
+    # Telegram allows ~30 messages/s per bot: split it between worker processes
+    outbox_global_rate: int = 25
+    bot_mode: str = "polling"
+    # Router mode: base URLs of the webhook-mode workers, e.g. http://127.0.0.1:8081,...
+    # Workers share state through db_path and should use fsm_storage="sqlite".
+    worker_urls: tuple = ()
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_path: str = "/webhook"
+    webhook_url: str = None
+    webhook_secret: str = None
+    # Polling mode only (webhook mode serves /metrics on webhook_port); 0 disables it
+    metrics_port: int = 0
+    log_file: str = "bot1.log"
+    log_level: str = "INFO"
+    # Also rotated whenever the file reaches log_max_bytes
+    log_rotate_when: str = "midnight"
+    log_max_bytes: int = 10 * 1024 * 1024
+    log_backup_count: int = 14
+    user_cache_size: int = 10000
+    # Grading clears a student's topic from the teacher's worker; other workers
+    # behind the router see it after at most this many seconds
+    user_cache_ttl: int = 300
+    # Tashkent hours: digests are built off-peak, then sent at each group's
+    # own hour (/digestset), or at digest_send_hour if it has none
+    digest_build_hour: int = 3
+    digest_send_hour: int = 9
+    # A topic with no video gets a reminder, then is cleared; 0 disables either
+    topic_remind_hours: int = 24
+    topic_expire_hours: int = 72
+    # Students messaged per sweep; a backlog is worked off a batch a minute
+    reminder_batch_size: int = 200
+    default_groups: tuple = DEFAULT_GROUPS
+
+    def __post_init__(self):
+        if not self.token:
+            raise ConfigError("Bot token not found in environment variables. Please set TOKEN in .env file.")
+        if self.fsm_storage not in ("memory", "sqlite"):
+            raise ConfigError("FSM_STORAGE must be either 'memory' or 'sqlite'.")
+        if self.bot_mode not in ("polling", "webhook", "router"):
+            raise ConfigError("BOT_MODE must be 'polling', 'webhook' or 'router'.")
+        if self.bot_mode == "router" and not self.worker_urls:
+            raise ConfigError("WORKER_URLS must list the worker base URLs in router mode.")
+        if not isinstance(logging.getLevelName(self.log_level), int):
+            raise ConfigError("LOG_LEVEL must be one of DEBUG, INFO, WARNING, ERROR or CRITICAL.")
+        if not (0 <= self.digest_build_hour <= 23 and 0 <= self.digest_send_hour <= 23):
+            raise ConfigError("DIGEST_BUILD_HOUR and DIGEST_SEND_HOUR must be hours from 0 to 23.")
+        if self.topic_remind_hours < 0 or self.topic_expire_hours < 0 or self.reminder_batch_size < 1:
+            raise ConfigError(
+                "TOPIC_REMIND_HOURS and TOPIC_EXPIRE_HOURS must not be negative "
+                "and REMINDER_BATCH_SIZE must be at least 1."
+            )
+        if self.topic_expire_hours and self.topic_remind_hours >= self.topic_expire_hours:
+            raise ConfigError("TOPIC_REMIND_HOURS must be less than TOPIC_EXPIRE_HOURS.")
+
+    @classmethod
+    def from_env(cls, env=None):
+        env = os.environ if env is None else env
+        token = env.get("TOKEN")
+        if not token:
+            raise ConfigError("Bot token not found in environment variables. Please set TOKEN in .env file.")
+        teacher_id = env.get("TEACHER_ID")
+        if not teacher_id:
+            raise ConfigError("Teacher ID not found in environment variables. Please set TEACHER_ID in .env file.")
+        try:
+            teacher_id = int(teacher_id)
+        except ValueError:
+            raise ConfigError("TEACHER_ID must be a valid integer.") from None
+
+        defaults = {field.name: field.default for field in fields(cls)}
+        settings = {}
+        try:
+            for name, field in _INT_SETTINGS.items():
+                settings[field] = int(env.get(name, defaults[field]))
+        except ValueError:
+            names = list(_INT_SETTINGS)
+            raise ConfigError(
+                f"{', '.join(names[:-1])} and {names[-1]} must be valid integers."
+            ) from None
+
+        return cls(
+            token=token,
+            teacher_id=teacher_id,
+            db_path=env.get("DB_PATH", defaults["db_path"]),
+            fsm_storage=env.get("FSM_STORAGE", defaults["fsm_storage"]).lower(),
+            bot_mode=env.get("BOT_MODE", defaults["bot_mode"]).lower(),
+            worker_urls=tuple(
+                url.strip().rstrip("/") for url in env.get("WORKER_URLS", "").split(",") if url.strip()
+            ),
+            webhook_host=env.get("WEBHOOK_HOST", defaults["webhook_host"]),
+            webhook_path=env.get("WEBHOOK_PATH", defaults["webhook_path"]),
+            webhook_url=env.get("WEBHOOK_URL"),
+            webhook_secret=env.get("WEBHOOK_SECRET"),
+            log_file=env.get("LOG_FILE", defaults["log_file"]),
+            log_level=env.get("LOG_LEVEL", defaults["log_level"]).upper(),
+            log_rotate_when=env.get("LOG_ROTATE_WHEN", defaults["log_rotate_when"]),
+            **settings,
+        )
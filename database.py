@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+import aiosqlite
+
+
+class _TimedExecute:
+    """Awaitable / async context manager around one execute, reporting its duration."""
+
+    __slots__ = ("_result", "_sql", "_on_query", "_cursor")
+
+    def __init__(self, result, sql, on_query):
+        self._result = result
+        self._sql = sql
+        self._on_query = on_query
+        self._cursor = None
+
+    async def _run(self):
+        started = time.perf_counter()
+        try:
+            return await self._result
+        finally:
+            self._on_query(self._sql, time.perf_counter() - started)
+
+    def __await__(self):
+        return self._run().__await__()
+
+    async def __aenter__(self):
+        self._cursor = await self._run()
+        return self._cursor
+
+    async def __aexit__(self, *exc_info):
+        await self._cursor.close()
+
+
+class _TimedConnection:
+    """Connection proxy timing execute/executemany; everything else is passed through."""
+
+    __slots__ = ("_conn", "_on_query")
+
+    def __init__(self, conn, on_query):
+        self._conn = conn
+        self._on_query = on_query
+
+    def execute(self, sql, parameters=None):
+        return _TimedExecute(self._conn.execute(sql, parameters), sql, self._on_query)
+
+    def executemany(self, sql, parameters):
+        return _TimedExecute(self._conn.executemany(sql, parameters), sql, self._on_query)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class Database:
+    """Small pool of long-lived aiosqlite connections shared by all handlers.
+
+    Every connection runs in WAL mode so readers never block the single
+    writer, and keeps sqlite3's prepared-statement cache warm between updates.
+
+    `on_query(sql, seconds)` and `on_acquire(seconds)` are optional timing
+    hooks for statements and for waiting on a free connection.
+    """
+
+    def __init__(self, path, size=4, busy_timeout=5000, cached_statements=128,
+                 on_query=None, on_acquire=None):
+        self.path = path
+        self.size = size
+        self.busy_timeout = busy_timeout
+        self.cached_statements = cached_statements
+        self.on_query = on_query
+        self.on_acquire = on_acquire
+        self._pool = None
+        self._connections = []
+
+    async def _connect(self):
+        conn = await aiosqlite.connect(self.path, cached_statements=self.cached_statements)
+        await conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout)}")
+        await conn.execute("PRAGMA journal_mode = WAL")
+        await conn.execute("PRAGMA synchronous = NORMAL")
+        await conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    async def open(self):
+        if self._pool is not None:
+            return
+        self._pool = asyncio.Queue()
+        for _ in range(self.size):
+            conn = await self._connect()
+            self._connections.append(conn)
+            self._pool.put_nowait(conn)
+        logging.info("Database pool opened: %s (%d connections)", self.path, self.size)
+
+    async def close(self):
+        for conn in self._connections:
+            try:
+                await conn.close()
+            except Exception as e:
+                logging.error("Error closing database connection: %s", e)
+        self._connections = []
+        self._pool = None
+
+    @asynccontextmanager
+    async def acquire(self):
+        if self._pool is None:
+            raise RuntimeError("Database pool is not open. Call open() first.")
+        started = time.perf_counter()
+        conn = await self._pool.get()
+        if self.on_acquire:
+            self.on_acquire(time.perf_counter() - started)
+        try:
+            yield _TimedConnection(conn, self.on_query) if self.on_query else conn
+        except BaseException:
+            # Never hand a connection with a half-finished transaction back,
+            # also when the caller was cancelled.  Shielded so a second
+            # cancellation cannot interrupt it; the connection's thread runs
+            # the rollback before anything the next holder queues.
+            if conn.in_transaction:
+                await asyncio.shield(conn.rollback())
+            raise
+        finally:
+            self._pool.put_nowait(conn)
+
+    async def fetchone(self, query, params=()):
+        async with self.acquire() as conn:
+            async with conn.execute(query, params) as cursor:
+                return await cursor.fetchone()
+
+    async def fetchall(self, query, params=()):
+        async with self.acquire() as conn:
+            async with conn.execute(query, params) as cursor:
+                return await cursor.fetchall()
+
+    async def execute(self, query, params=()):
+        async with self.acquire() as conn:
+            await conn.execute(query, params)
+            await conn.commit()
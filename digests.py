@@ -0,0 +1,209 @@
+"""Weekly and monthly group digests pushed to the teachers.
+
+A recurring `digest_build` job runs once a day at the off-peak build hour
+(Tashkent time).  For every active group it renders the digest of the last
+completed week and month from `daily_rollup`, stores the text in the
+`digests` table and schedules a `digest_send` job at the group's own hour
+(groups.digest_hour, or the default send hour) that pushes it to the group's
+teacher.  A completed period never changes, so a stored digest is final:
+/digest and later sends read the text back instead of aggregating again, and
+each process also keeps the texts it has read in a small LRU.
+"""
+import logging
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from aiogram.methods import SendMessage
+
+import clock
+from renderer import clip, format_change
+from stats import get_range_stats, get_range_totals, get_topic_stats, student_range_query
+
+DIGEST_KINDS = ("weekly", "monthly")
+# groups.digest -> kinds it receives
+DIGEST_SETTINGS = {
+    "both": DIGEST_KINDS,
+    "weekly": ("weekly",),
+    "monthly": ("monthly",),
+    "off": (),
+}
+TOP_STUDENTS = 5
+TOP_TOPICS = 5
+# Names and topics are free text; clipped so a digest always fits one message
+MAX_LABEL_LENGTH = 60
+
+_TITLES = {
+    "weekly": ("📅 Haftalik hisobot", "o'tgan haftaga nisbatan"),
+    "monthly": ("📅 Oylik hisobot", "o'tgan oyga nisbatan"),
+}
+
+
+def last_completed(kind, period=None):
+    """(key, days, previous_days) of the last completed week or month.
+
+    `key` identifies the period in the `digests` table (the week's Monday or
+    "YYYY-MM"); `days` and `previous_days` are inclusive "YYYY-MM-DD" ranges
+    of that period and the one before it.
+    """
+    period = period or clock.current_period()
+    if kind == "weekly":
+        monday = period.today - timedelta(days=period.today.weekday() + 7)
+        days = (monday.isoformat(), (monday + timedelta(days=6)).isoformat())
+        previous = ((monday - timedelta(days=7)).isoformat(), (monday - timedelta(days=1)).isoformat())
+        return days[0], days, previous
+
+    year, month = (period.year, period.month - 1) if period.month > 1 else (period.year - 1, 12)
+    before = (year, month - 1) if month > 1 else (year - 1, 12)
+    return f"{year}-{month:02d}", clock.month_days(year, month), clock.month_days(*before)
+
+
+async def render_digest(db, kind, group, days, previous_days):
+    """Digest text of one group, or None if nothing was graded in either period."""
+    stats = await get_range_stats(db, *days, (group,))
+    prev_students, prev_total, prev_avg = await get_range_totals(db, *previous_days, (group,))
+    if not stats and not prev_total:
+        return None
+    _, students, total, avg, g5, g4, g3, g2, g1 = stats[0] if stats else (group, 0, 0, None, 0, 0, 0, 0, 0)
+
+    # Students registered by the end of the period, so a rebuild counts the same
+    async with db.execute("""
+        SELECT COUNT(*) FROM users
+        WHERE group_name = ? AND (registered_at IS NULL OR registered_at < ?)
+    """, (group, clock.day_end(days[1]))) as cursor:
+        registered = (await cursor.fetchone())[0]
+    missing = max(0, registered - students)
+
+    title, compared = _TITLES[kind]
+    lines = [
+        f"{title}: {group}-guruh",
+        f"🗓 {days[0]} — {days[1]}",
+        "",
+        f"📝 Retellinglar: {total} ta ({format_change(total, prev_total)} {compared})",
+        f"👥 Topshirgan o'quvchilar: {students} ta / {prev_students} ta",
+        f"😴 Topshirmaganlar: {missing} ta",
+        f"⭐️ O'rtacha ball: {avg or 0} / {prev_avg or 0}",
+        f"5️⃣ - {g5 or 0} ta  4️⃣ - {g4 or 0} ta  3️⃣ - {g3 or 0} ta  2️⃣ - {g2 or 0} ta  1️⃣ - {g1 or 0} ta",
+    ]
+
+    async with db.execute(*student_range_query(*days, group, limit=TOP_STUDENTS)) as cursor:
+        top = await cursor.fetchall()
+    if top:
+        lines += ["", "🏆 Eng yaxshi o'quvchilar:"]
+        lines += [f"{i}. {clip(name, MAX_LABEL_LENGTH)} — {avg or 0} ({count} ta)" for i, (name, count, avg, *_) in enumerate(top, 1)]
+
+    topics = await get_topic_stats(db, *days, (group,), limit=TOP_TOPICS)
+    if topics:
+        lines += ["", "📚 Ko'p topshirilgan mavzular:"]
+        lines += [f"• {clip(topic, MAX_LABEL_LENGTH)} — {count} ta, {avg or 0}" for topic, _, count, avg, *_ in topics]
+    return "\n".join(lines)
+
+
+class DigestService:
+    def __init__(self, database, group_registry, teachers, outbox, scheduler,
+                 build_hour=3, send_hour=9, max_cached=256):
+        self.database = database
+        self.group_registry = group_registry
+        self.teachers = teachers
+        self.outbox = outbox
+        self.scheduler = scheduler
+        self.build_hour = build_hour
+        self.send_hour = send_hour
+        self.max_cached = max_cached
+        # (kind, key, group) -> text, or None for "nothing to report"
+        self._texts = OrderedDict()
+
+    def _next_build(self):
+        """Seconds until the next build hour."""
+        period = clock.current_period()
+        run_at = period.day_start + self.build_hour * 3600
+        if run_at <= time.time():
+            run_at = period.day_end + self.build_hour * 3600
+        return run_at - time.time()
+
+    async def ensure_scheduled(self):
+        """Queue the daily build job unless another start (or worker) already did."""
+        await self.scheduler.schedule_once("digest_build", {}, delay=self._next_build())
+
+    def _remember(self, cache_key, text):
+        self._texts[cache_key] = text
+        self._texts.move_to_end(cache_key)
+        while len(self._texts) > self.max_cached:
+            self._texts.popitem(last=False)
+
+    async def get(self, kind, group, period=None):
+        """(key, text) of the group's last completed digest, building it on first use.
+
+        `text` is None when nothing was graded in that period or the one before.
+        """
+        key, days, previous_days = last_completed(kind, period)
+        cache_key = (kind, key, group)
+        if cache_key in self._texts:
+            self._texts.move_to_end(cache_key)
+            return key, self._texts[cache_key]
+
+        row = await self.database.fetchone(
+            "SELECT text FROM digests WHERE kind = ? AND period = ? AND group_name = ?", cache_key
+        )
+        if row:
+            text = row[0]
+        else:
+            async with self.database.acquire() as db:
+                text = await render_digest(db, kind, group, days, previous_days)
+                if text is not None:
+                    # Another worker may have built it meanwhile; either text is the same
+                    await db.execute("""
+                        INSERT OR IGNORE INTO digests (kind, period, group_name, text, built_at)
+                        VALUES (?, ?, ?, ?, ?)
+                    """, (*cache_key, text, int(time.time())))
+                    await db.commit()
+        self._remember(cache_key, text)
+        return key, text
+
+    async def build(self, payload=None):
+        """The `digest_build` job: build today's digests and schedule their sends."""
+        try:
+            period = clock.current_period()
+            built = 0
+            for group in await self.group_registry.active():
+                setting, hour = await self.group_registry.digest_of(group)
+                for kind in DIGEST_SETTINGS[setting]:
+                    key, text = await self.get(kind, group, period)
+                    if text is None:
+                        continue
+                    row = await self.database.fetchone(
+                        "SELECT sent_at FROM digests WHERE kind = ? AND period = ? AND group_name = ?",
+                        (kind, key, group)
+                    )
+                    if row is None or row[0] is not None:
+                        continue
+                    send_at = period.day_start + (self.send_hour if hour is None else hour) * 3600
+                    await self.scheduler.schedule(
+                        "digest_send", {"kind": kind, "period": key, "group": group},
+                        delay=max(0, send_at - time.time())
+                    )
+                    built += 1
+            logging.info("Scheduled %d digests", built)
+        finally:
+            # Recurring: losing this job would stop every digest
+            await self.scheduler.reschedule("digest_build", {}, delay=self._next_build())
+
+    async def send(self, payload):
+        """The `digest_send` job: push one stored digest to the group's teacher, once."""
+        kind, key, group = payload["kind"], payload["period"], payload["group"]
+        setting, _ = await self.group_registry.digest_of(group)
+        if kind not in DIGEST_SETTINGS[setting]:
+            return
+        async with self.database.acquire() as db:
+            async with db.execute("""
+                UPDATE digests SET sent_at = ?
+                WHERE kind = ? AND period = ? AND group_name = ? AND sent_at IS NULL
+                RETURNING text
+            """, (int(time.time()), kind, key, group)) as cursor:
+                row = await cursor.fetchone()
+            await db.commit()
+        if row is None:
+            # Already sent (e.g. the build job ran twice) or the group was renamed
+            return
+        chat_id = await self.teachers.route(await self.group_registry.teacher_of(group))
+        self.outbox.enqueue(SendMessage(chat_id=chat_id, text=row[0]))
@@ -0,0 +1,72 @@
+"""CSV export of grades.
+
+The `grades JOIN users` result is read with `fetchmany` and written batch by
+batch into a SpooledTemporaryFile: small exports stay in memory, large ones
+roll over to disk, so memory use does not grow with the number of rows.
+"""
+import csv
+import io
+import tempfile
+from datetime import datetime
+
+from aiogram.types import InputFile
+
+from renderer import fetch_rows
+
+CSV_HEADER = ("date", "full_name", "group", "topic", "grade", "feedback")
+
+
+class SpooledInputFile(InputFile):
+    """Upload an already written (spooled) binary file without loading it whole."""
+
+    def __init__(self, file, filename, chunk_size=64 * 1024):
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, bot):
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
+
+
+def export_query(where):
+    """SELECT of the grades matching `where` (over aliases g and u), oldest first."""
+    return f"""
+        SELECT g.date, u.full_name, u.group_name, g.topic, g.grade, g.feedback
+        FROM grades g
+        JOIN users u ON u.user_id = g.user_id
+        WHERE {where}
+        ORDER BY g.date, g.id
+    """
+
+
+async def export_grades_csv(db, where, params, tz, batch_size=500, max_memory=1024 * 1024):
+    """Write grades matching `where` (over aliases g and u) to a spooled CSV file.
+
+    Returns `(file, rows)`; the caller owns the file and must close it.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory, mode="w+b")
+    # The BOM lets Excel detect UTF-8 (names are often in Cyrillic)
+    spool.write(b"\xef\xbb\xbf")
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+
+    rows = 0
+    try:
+        async with db.execute(export_query(where), params) as cursor:
+            async for date, full_name, group_name, topic, grade, feedback in fetch_rows(cursor, batch_size):
+                writer.writerow((
+                    datetime.fromtimestamp(date, tz).strftime("%Y-%m-%d %H:%M:%S"),
+                    full_name, group_name, topic, grade, feedback or ""
+                ))
+                rows += 1
+                if rows % batch_size == 0:
+                    spool.write(buffer.getvalue().encode("utf-8"))
+                    buffer.seek(0)
+                    buffer.truncate()
+        spool.write(buffer.getvalue().encode("utf-8"))
+    except BaseException:
+        spool.close()
+        raise
+    return spool, rows
@@ -0,0 +1,118 @@
+import json
+import time
+from collections import OrderedDict
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder
+
+
+def _state_name(state):
+    return state.state if isinstance(state, State) else state
+
+
+class BoundedMemoryStorage(BaseStorage):
+    """In-process FSM storage with LRU eviction and idle expiry.
+
+    Unlike aiogram's MemoryStorage it never holds more than `max_entries`
+    users, and an entry untouched for `ttl` seconds reads back as empty.
+    """
+
+    def __init__(self, max_entries=10000, ttl=24 * 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._records = OrderedDict()
+
+    def _get(self, key):
+        record = self._records.get(key)
+        if record is None:
+            return None
+        if time.monotonic() - record["touched"] > self.ttl:
+            del self._records[key]
+            return None
+        return record
+
+    def _put(self, key, state, data):
+        if state is None and not data:
+            # Nothing worth keeping for this user
+            self._records.pop(key, None)
+            return
+        self._records[key] = {"state": state, "data": data, "touched": time.monotonic()}
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_entries:
+            self._records.popitem(last=False)
+
+    async def set_state(self, key, state=None):
+        record = self._get(key)
+        self._put(key, _state_name(state), record["data"] if record else {})
+
+    async def get_state(self, key):
+        record = self._get(key)
+        return record["state"] if record else None
+
+    async def set_data(self, key, data):
+        record = self._get(key)
+        self._put(key, record["state"] if record else None, data.copy())
+
+    async def get_data(self, key):
+        record = self._get(key)
+        return record["data"].copy() if record else {}
+
+    async def close(self):
+        self._records.clear()
+
+
+class SQLiteStorage(BaseStorage):
+    """FSM storage in the bot's own SQLite database (`fsm_state` table).
+
+    Survives restarts and can be shared by several processes using the same
+    database file.  Rows idle for longer than `ttl` seconds read back as empty
+    and are deleted by `purge_expired()`.
+    """
+
+    def __init__(self, database, ttl=24 * 3600):
+        self.database = database
+        self.ttl = ttl
+        self.key_builder = DefaultKeyBuilder(with_destiny=True)
+
+    async def _get(self, key):
+        row = await self.database.fetchone("""
+            SELECT state, data FROM fsm_state
+            WHERE key = ? AND updated_at >= ?
+        """, (self.key_builder.build(key), int(time.time()) - self.ttl))
+        if not row:
+            return None, {}
+        return row[0], json.loads(row[1]) if row[1] else {}
+
+    async def _put(self, key, state, data):
+        storage_key = self.key_builder.build(key)
+        if state is None and not data:
+            await self.database.execute("DELETE FROM fsm_state WHERE key = ?", (storage_key,))
+            return
+        await self.database.execute("""
+            INSERT OR REPLACE INTO fsm_state (key, state, data, updated_at)
+            VALUES (?, ?, ?, ?)
+        """, (storage_key, state, json.dumps(data, ensure_ascii=False), int(time.time())))
+
+    async def set_state(self, key, state=None):
+        _, data = await self._get(key)
+        await self._put(key, _state_name(state), data)
+
+    async def get_state(self, key):
+        state, _ = await self._get(key)
+        return state
+
+    async def set_data(self, key, data):
+        state, _ = await self._get(key)
+        await self._put(key, state, data)
+
+    async def get_data(self, key):
+        _, data = await self._get(key)
+        return data
+
+    async def purge_expired(self):
+        await self.database.execute(
+            "DELETE FROM fsm_state WHERE updated_at < ?", (int(time.time()) - self.ttl,)
+        )
+
+    async def close(self):
+        pass
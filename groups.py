@@ -0,0 +1,187 @@
+import logging
+import time
+
+from keyboards import reset_keyboard_cache
+
+MAX_GROUP_NAME_LENGTH = 20
+
+
+def is_valid_group_name(name):
+    # "_" separates parts of callback_data, so it cannot appear in a name
+    return bool(name) and len(name) <= MAX_GROUP_NAME_LENGTH and "_" not in name
+
+
+class GroupRegistry:
+    """Groups stored in the `groups` table with a cached snapshot of active ones.
+
+    Changes made through this registry invalidate the snapshot (and the
+    memoized keyboards) immediately.  Changes made by another process are
+    picked up within `refresh_interval` seconds by comparing MAX(changed_at).
+    The snapshot also maps every group to its teacher (None if unassigned)
+    and to its digest setting.
+    """
+
+    def __init__(self, database, refresh_interval=30):
+        self.database = database
+        self.refresh_interval = refresh_interval
+        self._active = ()
+        self._active_set = frozenset()
+        self._active_by_teacher = {}
+        self._owned_by_teacher = {}
+        self._teacher_of = {}
+        self._digest_of = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    async def _current_version(self):
+        row = await self.database.fetchone("SELECT MAX(changed_at) FROM groups")
+        return row[0]
+
+    async def _reload(self):
+        rows = await self.database.fetchall(
+            "SELECT name, archived, teacher_id, digest, digest_hour FROM groups ORDER BY name"
+        )
+        self._active = tuple(name for name, archived, *_ in rows if not archived)
+        self._active_set = frozenset(self._active)
+        self._teacher_of = {name: teacher_id for name, _, teacher_id, *_ in rows}
+        self._digest_of = {name: (digest, hour) for name, _, _, digest, hour in rows}
+        active, owned = {}, {}
+        for name, archived, teacher_id, *_ in rows:
+            owned.setdefault(teacher_id, []).append(name)
+            if not archived:
+                active.setdefault(teacher_id, []).append(name)
+        self._active_by_teacher = {k: tuple(v) for k, v in active.items()}
+        self._owned_by_teacher = {k: tuple(v) for k, v in owned.items()}
+        self._version = await self._current_version()
+        self._checked_at = time.monotonic()
+        reset_keyboard_cache()
+
+    async def load(self, defaults=()):
+        """Seed a fresh install's empty table with `defaults` and take the first snapshot.
+
+        Databases that had students before the groups table existed got the
+        defaults from migration 4 already.
+        """
+        row = await self.database.fetchone("SELECT COUNT(*) FROM groups")
+        if not row[0] and defaults:
+            now = time.time_ns() // 1_000_000
+            async with self.database.acquire() as db:
+                await db.executemany(
+                    "INSERT OR IGNORE INTO groups (name, archived, changed_at) VALUES (?, 0, ?)",
+                    [(name, now) for name in defaults]
+                )
+                await db.commit()
+        await self._reload()
+        logging.info("Loaded %d active groups", len(self._active))
+
+    async def _refresh(self):
+        if time.monotonic() - self._checked_at > self.refresh_interval:
+            self._checked_at = time.monotonic()
+            if await self._current_version() != self._version:
+                await self._reload()
+
+    async def active(self, teacher_id=None):
+        """Tuple of active group names (only `teacher_id`'s if given), kept fresh."""
+        await self._refresh()
+        if teacher_id is None:
+            return self._active
+        return self._active_by_teacher.get(teacher_id, ())
+
+    async def owned(self, teacher_id):
+        """Every group of `teacher_id`, archived ones included (for history)."""
+        await self._refresh()
+        return self._owned_by_teacher.get(teacher_id, ())
+
+    async def teacher_of(self, name):
+        await self._refresh()
+        return self._teacher_of.get(name)
+
+    async def digest_of(self, name):
+        """(setting, hour) of a group's digests; hour is None for the default."""
+        await self._refresh()
+        return self._digest_of.get(name, ("off", None))
+
+    async def is_active(self, name):
+        await self.active()
+        return name in self._active_set
+
+    async def all(self):
+        return await self.database.fetchall(
+            "SELECT name, archived, teacher_id FROM groups ORDER BY archived, name"
+        )
+
+    async def add(self, name):
+        """Add a group or un-archive an existing one; False if it is already active."""
+        now = time.time_ns() // 1_000_000
+        async with self.database.acquire() as db:
+            cursor = await db.execute("""
+                INSERT INTO groups (name, archived, changed_at) VALUES (?, 0, ?)
+                ON CONFLICT (name) DO UPDATE SET archived = 0, changed_at = excluded.changed_at
+                WHERE archived = 1
+            """, (name, now))
+            changed = cursor.rowcount > 0
+            await db.commit()
+        if changed:
+            await self._reload()
+        return changed
+
+    async def archive(self, name):
+        async with self.database.acquire() as db:
+            cursor = await db.execute(
+                "UPDATE groups SET archived = 1, changed_at = ? WHERE name = ? AND archived = 0",
+                (time.time_ns() // 1_000_000, name)
+            )
+            changed = cursor.rowcount > 0
+            await db.commit()
+        if changed:
+            await self._reload()
+        return changed
+
+    async def assign(self, name, teacher_id):
+        """Give a group to `teacher_id` (None to unassign); False if there is no such group."""
+        async with self.database.acquire() as db:
+            cursor = await db.execute(
+                "UPDATE groups SET teacher_id = ?, changed_at = ? WHERE name = ?",
+                (teacher_id, time.time_ns() // 1_000_000, name)
+            )
+            changed = cursor.rowcount > 0
+            await db.commit()
+        if changed:
+            await self._reload()
+        return changed
+
+    async def set_digest(self, name, setting, hour=None):
+        """Choose which digests a group gets and when; False if there is no such group."""
+        async with self.database.acquire() as db:
+            cursor = await db.execute(
+                "UPDATE groups SET digest = ?, digest_hour = ?, changed_at = ? WHERE name = ?",
+                (setting, hour, time.time_ns() // 1_000_000, name)
+            )
+            changed = cursor.rowcount > 0
+            await db.commit()
+        if changed:
+            await self._reload()
+        return changed
+
+    async def rename(self, old_name, new_name):
+        """Rename a group and move its students; False if old is missing or new is taken."""
+        async with self.database.acquire() as db:
+            async with db.execute("SELECT 1 FROM groups WHERE name = ?", (new_name,)) as cursor:
+                if await cursor.fetchone():
+                    return False
+            cursor = await db.execute(
+                "UPDATE groups SET name = ?, changed_at = ? WHERE name = ?",
+                (new_name, time.time_ns() // 1_000_000, old_name)
+            )
+            if cursor.rowcount == 0:
+                await db.rollback()
+                return False
+            await db.execute(
+                "UPDATE users SET group_name = ? WHERE group_name = ?", (new_name, old_name)
+            )
+            await db.execute("DELETE FROM group_stats WHERE group_name = ?", (old_name,))
+            # Stored digests carry the old name in their text
+            await db.execute("DELETE FROM digests WHERE group_name = ?", (old_name,))
+            await db.commit()
+        await self._reload()
+        return True
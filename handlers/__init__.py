@@ -0,0 +1,13 @@
+from handlers import admin, general, grading, registration, statistics
+
+
+def create_routers():
+    """Fresh routers for one Dispatcher, in the order their handlers are tried."""
+    return [
+        registration.create_router(),
+        grading.create_router(),
+        statistics.create_router(),
+        admin.create_router(),
+        general.create_router(),
+        general.create_fallback_router(),
+    ]
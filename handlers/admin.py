@@ -0,0 +1,204 @@
+"""Head-teacher administration (groups and teachers) and /health."""
+from aiogram import Router, types
+from aiogram.filters import Command
+
+from app import App
+from groups import is_valid_group_name
+
+
+async def show_groups(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    groups = await app.group_registry.all()
+    active = [
+        f"{name} ({teacher_id})" if teacher_id else name
+        for name, archived, teacher_id in groups if not archived
+    ]
+    archived = [name for name, archived, _ in groups if archived]
+    text = (
+        f"👥 Faol guruhlar ({len(active)} ta):\n{', '.join(active) or '-'}\n\n"
+        f"🗄 Arxivdagi guruhlar ({len(archived)} ta):\n{', '.join(archived) or '-'}\n\n"
+        "/addgroup <nom> - guruh qo'shish\n"
+        "/archivegroup <nom> - guruhni arxivlash\n"
+        "/renamegroup <eski> <yangi> - guruh nomini o'zgartirish\n"
+        "/assigngroup <nom> <o'qituvchi ID | 0> - guruhni o'qituvchiga biriktirish"
+    )
+    await message.answer(text)
+
+async def add_group(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    args = message.text.split()[1:]
+    if len(args) != 1 or not is_valid_group_name(args[0]):
+        await message.answer("Foydalanish: /addgroup <nom> (\"_\" belgisisiz, 20 belgigacha)")
+        return
+
+    if await app.group_registry.add(args[0]):
+        await message.answer(f"✅ {args[0]}-guruh qo'shildi.")
+    else:
+        await message.answer(f"❌ {args[0]}-guruh allaqachon mavjud.")
+
+async def archive_group(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    args = message.text.split()[1:]
+    if len(args) != 1:
+        await message.answer("Foydalanish: /archivegroup <nom>")
+        return
+
+    if await app.group_registry.archive(args[0]):
+        await message.answer(f"🗄 {args[0]}-guruh arxivlandi.")
+    else:
+        await message.answer(f"❌ {args[0]}-guruh topilmadi yoki allaqachon arxivlangan.")
+
+async def rename_group(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    args = message.text.split()[1:]
+    if len(args) != 2 or not is_valid_group_name(args[1]):
+        await message.answer("Foydalanish: /renamegroup <eski> <yangi> (\"_\" belgisisiz, 20 belgigacha)")
+        return
+
+    old_name, new_name = args
+    if await app.group_registry.rename(old_name, new_name):
+        app.profiles.clear()
+        await message.answer(f"✅ {old_name}-guruh nomi {new_name} ga o'zgartirildi.")
+    else:
+        await message.answer(f"❌ {old_name}-guruh topilmadi yoki {new_name} nomi band.")
+
+async def show_teachers(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat bosh o'qituvchi uchun!")
+        return
+
+    lines = []
+    for teacher_id, name in await app.teachers.all():
+        if app.teachers.is_head(teacher_id):
+            lines.append(f"👨‍🏫 {name or teacher_id} [{teacher_id}] (bosh o'qituvchi): biriktirilmagan guruhlar")
+            continue
+        groups = await app.group_registry.active(teacher_id)
+        lines.append(f"👨‍🏫 {name or teacher_id} [{teacher_id}]: {', '.join(groups) or '-'}")
+    await message.answer(
+        f"O'qituvchilar ({len(lines)} ta):\n" + "\n".join(lines) + "\n\n"
+        "/addteacher <ID> [ism] - o'qituvchi qo'shish\n"
+        "/removeteacher <ID> - o'qituvchini o'chirish\n"
+        "/assigngroup <guruh> <ID | 0> - guruhni biriktirish"
+    )
+
+async def add_teacher(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat bosh o'qituvchi uchun!")
+        return
+
+    args = message.text.split(maxsplit=2)[1:]
+    if not args or not args[0].isdigit():
+        await message.answer("Foydalanish: /addteacher <Telegram ID> [ism]")
+        return
+
+    teacher_id = int(args[0])
+    await app.teachers.add(teacher_id, args[1] if len(args) > 1 else None)
+    await message.answer(f"✅ {teacher_id} o'qituvchi sifatida qo'shildi.")
+
+async def remove_teacher(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat bosh o'qituvchi uchun!")
+        return
+
+    args = message.text.split()[1:]
+    if len(args) != 1 or not args[0].isdigit():
+        await message.answer("Foydalanish: /removeteacher <Telegram ID>")
+        return
+
+    teacher_id = int(args[0])
+    if app.teachers.is_head(teacher_id):
+        await message.answer("❌ Bosh o'qituvchini o'chirib bo'lmaydi.")
+    elif await app.teachers.remove(teacher_id):
+        await message.answer(
+            f"✅ {teacher_id} o'chirildi. Uning guruhlari bosh o'qituvchiga yuboriladi."
+        )
+    else:
+        await message.answer(f"❌ {teacher_id} o'qituvchilar ro'yxatida yo'q.")
+
+async def assign_group(message: types.Message, app: App):
+    if not app.teachers.is_head(message.from_user.id):
+        await message.answer("Bu buyruq faqat bosh o'qituvchi uchun!")
+        return
+
+    args = message.text.split()[1:]
+    if len(args) != 2 or not args[1].isdigit():
+        await message.answer("Foydalanish: /assigngroup <guruh> <o'qituvchi ID | 0>")
+        return
+
+    group, teacher_id = args[0], int(args[1]) or None
+    if teacher_id is not None and not await app.teachers.is_teacher(teacher_id):
+        await message.answer(f"❌ {teacher_id} o'qituvchi emas. Avval /addteacher bilan qo'shing.")
+        return
+
+    if not await app.group_registry.assign(group, teacher_id):
+        await message.answer(f"❌ {group}-guruh topilmadi.")
+    elif teacher_id is None:
+        await message.answer(f"✅ {group}-guruh bosh o'qituvchiga qaytarildi.")
+    else:
+        await message.answer(f"✅ {group}-guruh {teacher_id} ga biriktirildi.")
+
+def format_ms(seconds):
+    return "—" if seconds is None else f"{seconds * 1000:.0f} ms"
+
+async def show_health(message: types.Message, app: App):
+    if not await app.teachers.is_teacher(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    uptime = int(app.metrics.uptime)
+    slowest = sorted(
+        ((app.metrics.handlers.quantile(0.95, labels), labels[0], app.metrics.handlers.count(*labels))
+         for labels in app.metrics.handlers.series()),
+        reverse=True
+    )[:5]
+    slow_queries = sorted(
+        ((app.metrics.queries.quantile(0.95, labels), labels[0]) for labels in app.metrics.queries.series()),
+        reverse=True
+    )[:3]
+
+    lines = [
+        "🩺 Bot holati\n",
+        f"⏱ Ishlash vaqti: {uptime // 3600} soat {uptime % 3600 // 60} daqiqa",
+        f"📨 Yangilanishlar: {sum(app.metrics.updates.count(*l) for l in app.metrics.updates.series())} ta, "
+        f"p50 {format_ms(app.metrics.updates.quantile(0.5))}, p95 {format_ms(app.metrics.updates.quantile(0.95))}",
+        f"❗️ Handler xatolari: {app.metrics.handler_errors.total()} ta",
+        "",
+        "🐢 Eng sekin handlerlar (p95):",
+        *[f"  {name}: {format_ms(p95)} ({count} ta)" for p95, name, count in slowest],
+        "",
+        f"🗄 DB so'rovlari p95: {format_ms(app.metrics.queries.quantile(0.95))}, "
+        f"ulanish kutish p95: {format_ms(app.metrics.pool_wait.quantile(0.95))}",
+        *[f"  {name}: {format_ms(p95)}" for p95, name in slow_queries],
+        "",
+        f"📤 Telegram API p95: {format_ms(app.metrics.api_requests.quantile(0.95))}, "
+        f"xatolar: {app.metrics.api_errors.total()} ta",
+        f"📬 Outbox navbati: {app.outbox.depth} ta",
+        f"⏰ Rejalashtirilgan ishlar: {app.scheduler.pending} ta",
+    ]
+    await message.answer("\n".join(lines))
+
+
+def create_router():
+    router = Router(name="admin")
+    router.message.register(show_groups, Command("groups"))
+    router.message.register(add_group, Command("addgroup"))
+    router.message.register(archive_group, Command("archivegroup"))
+    router.message.register(rename_group, Command("renamegroup"))
+    router.message.register(show_teachers, Command("teachers"))
+    router.message.register(add_teacher, Command("addteacher"))
+    router.message.register(remove_teacher, Command("removeteacher"))
+    router.message.register(assign_group, Command("assigngroup"))
+    router.message.register(show_health, Command("health"))
+    return router
@@ -0,0 +1,37 @@
+"""States and helpers shared by the handler routers."""
+from aiogram.fsm.state import State, StatesGroup
+
+import clock
+
+
+class RegistrationStates(StatesGroup):
+    WAITING_FOR_FULL_NAME = State()
+    WAITING_FOR_GROUP = State()
+    WAITING_FOR_TOPIC = State()
+    WAITING_FOR_VIDEO = State()
+
+async def teacher_groups(app, user_id):
+    """Active groups offered to a teacher; the head teacher sees all of them."""
+    return await app.group_registry.active(None if app.teachers.is_head(user_id) else user_id)
+
+async def teacher_scope(app, user_id):
+    """Groups whose statistics a teacher may read; None means every group."""
+    if app.teachers.is_head(user_id):
+        return None
+    return await app.group_registry.owned(user_id)
+
+async def can_view_group(app, user_id, group):
+    return app.teachers.is_head(user_id) or await app.group_registry.teacher_of(group) == user_id
+
+def format_time_period(start_time, end_time):
+    duration = end_time - start_time
+    minutes = duration.seconds // 60
+    seconds = duration.seconds % 60
+    return f"{minutes:02d}:{seconds:02d}"
+
+def get_current_utc():
+    return clock.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+def get_current_tashkent():
+    return clock.now().strftime("%Y-%m-%d %H:%M:%S")
+
@@ -0,0 +1,76 @@
+"""/help and the catch-all message handler."""
+import logging
+
+from aiogram import Router, types
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+
+from app import App
+from handlers.common import get_current_tashkent, get_current_utc
+
+
+# Add help command
+async def show_help(message: types.Message, app: App):
+    current_time_utc = get_current_utc()
+    current_time_tashkent = get_current_tashkent()
+    
+    if await app.teachers.is_teacher(message.from_user.id):
+        admin_commands = (
+            "/groups - Guruhlarni boshqarish\n"
+            "/teachers - O'qituvchilarni boshqarish\n"
+        ) if app.teachers.is_head(message.from_user.id) else ""
+        help_text = (
+            "🎓 O'qituvchi uchun buyruqlar:\n\n"
+            "/start - Botni ishga tushirish va statistika ko'rish\n"
+            "/monthly - Oylik statistikani ko'rish\n"
+            "/queue - Baholanmagan retellinglarni baholash\n"
+            "/export [guruh] [YYYY-MM] - Baholarni CSV faylga yuklash\n"
+            "/stats - Davr, hafta va mavzular bo'yicha statistika\n"
+            "/digest - Haftalik va oylik hisobotlar\n"
+            "/health - Bot holati va tezligi\n"
+            f"{admin_commands}"
+            "/help - Yordam xabarini ko'rish\n\n"
+            "📊 Statistika:\n"
+            "- Guruhlar bo'yicha statistika\n"
+            "- Oylik statistika\n"
+            "- O'quvchilar reytingi\n\n"
+            "⭐️ Baholash:\n"
+            "- Video reteling kelganda avtomatik ko'rsatiladi\n"
+            "- 1 dan 5 gacha baho qo'yish mumkin\n\n"
+            f"🕒 Joriy vaqt (UTC): {current_time_utc}\n"
+            f"🕒 Joriy vaqt (Toshkent): {current_time_tashkent}"
+        )
+    else:
+        help_text = (
+            "🎓 O'quvchi uchun buyruqlar:\n\n"
+            "/start - Botni ishga tushirish va ro'yxatdan o'tish\n"
+            "/help - Yordam xabarini ko'rish\n\n"
+            "📝 Reteling topshirish:\n"
+            "1. Mavzu kiriting\n"
+            "2. Video yuboring\n"
+            "3. O'qituvchi bahosini kuting\n\n"
+            "📊 Statistika:\n"
+            "- Baho qo'yilganda avtomatik ko'rsatiladi\n\n"
+            f"🕒 Joriy vaqt: {current_time_tashkent}"
+        )
+
+    logging.info("Help command used by %s", message.from_user.username or message.from_user.id)
+    
+    await message.answer(help_text)
+
+async def handle_messages(message: types.Message, state: FSMContext):
+    if await state.get_state() is None:
+        await message.answer("Iltimos, /start buyrug'ini yuboring.")
+
+
+def create_router():
+    router = Router(name="general")
+    router.message.register(show_help, Command("help"))
+    return router
+
+
+def create_fallback_router():
+    # Included last so commands and state handlers in other routers take precedence
+    router = Router(name="fallback")
+    router.message.register(handle_messages)
+    return router
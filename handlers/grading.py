@@ -0,0 +1,383 @@
+"""Video submissions and grading: forwarding to the teacher, grade buttons and /queue."""
+import logging
+import time
+from datetime import datetime
+
+from aiogram import F, Router, types
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.methods import DeleteMessage, EditMessageReplyMarkup, EditMessageText, ForwardMessage, SendMessage
+from aiogram.types import CallbackQuery
+
+from app import App
+from clock import TASHKENT
+from handlers.common import RegistrationStates
+from keyboards import create_grade_keyboard, create_queue_keyboard
+
+
+async def handle_video(message: types.Message, state: FSMContext, app: App):
+    user_id = message.from_user.id
+    # With several workers the topic may have been cleared by grading or the
+    # topic sweep in another process, so it is read from the database there
+    user = await app.profiles.get(user_id, refresh=app.config.bot_mode != "polling")
+
+    if not user or not user.current_topic:
+        # Rejected, so the same video may be sent again once this is fixed
+        app.throttling.forget(user_id, message.video_note.file_unique_id)
+
+    if not user:
+        await message.answer(
+            "Siz ro'yxatdan o'tmagansiz. Iltimos, /start buyrug'ini yuborib ro'yxatdan o'ting."
+        )
+        return
+
+    if not user.current_topic:
+        await state.set_state(RegistrationStates.WAITING_FOR_TOPIC)
+        await message.answer(
+            "Avval retelling mavzusini kiriting.\n"
+            "Mavzuni kiriting:"
+        )
+        return
+
+    # The profile is shared with the cache; keep the topic this video was sent for
+    topic = user.current_topic
+    tashkent_time = message.date.astimezone(TASHKENT)
+    formatted_date = tashkent_time.strftime("%d.%m.%Y")
+    formatted_time = tashkent_time.strftime("%H:%M")
+
+    student_info = (
+        f"📝 Yangi video retelling\n\n"
+        f"👤 O'quvchi: {user.full_name}\n"
+        f"👥 Guruh: {user.group_name}\n"
+        f"📚 Mavzu: {topic}\n"
+        f"🔗 Username: @{message.from_user.username}\n"
+        f"📅 Sana: {formatted_date}\n"
+        f"⏰ Vaqt: {formatted_time}"
+    )
+
+    grade_keyboard = create_grade_keyboard(message.chat.id, message.message_id)
+    teacher_id = await app.teachers.route(await app.group_registry.teacher_of(user.group_name))
+
+    # Both teacher-side messages are queued right away so the forward stays
+    # directly under its info message; the outbox sends them in order.  The
+    # grade buttons are added only once the submission row exists, so a
+    # click can never arrive before it.
+    sent = {}
+
+    async def on_info_sent(teacher_msg):
+        sent["info_msg_id"] = teacher_msg.message_id
+
+    async def on_forwarded(forwarded_msg):
+        if "info_msg_id" not in sent:
+            app.outbox.enqueue(DeleteMessage(chat_id=teacher_id, message_id=forwarded_msg.message_id))
+            return
+
+        try:
+            await app.submissions.add(
+                message.chat.id,
+                message.message_id,
+                user_id,
+                topic,
+                forwarded_msg.message_id,
+                sent["info_msg_id"],
+                teacher_id
+            )
+        except Exception as e:
+            for teacher_msg_id in (sent["info_msg_id"], forwarded_msg.message_id):
+                app.outbox.enqueue(DeleteMessage(chat_id=teacher_id, message_id=teacher_msg_id))
+            await on_failed(e)
+            return
+
+        app.outbox.enqueue(EditMessageReplyMarkup(
+            chat_id=teacher_id, message_id=sent["info_msg_id"], reply_markup=grade_keyboard
+        ))
+        app.outbox.enqueue(SendMessage(
+            chat_id=message.chat.id,
+            text=(
+                "✅ Video retelling muvaffaqiyatli yuborildi!\n"
+                "👨‍🏫 O'qituvchi tekshirgandan so'ng sizga baho va qayta aloqa yuboriladi."
+            )
+        ))
+
+    async def on_failed(error):
+        # Info message and forward may both fail; tell the student once
+        if sent.get("failed"):
+            return
+        sent["failed"] = True
+        logging.error("Error sending message to teacher: %s", error)
+        # The teacher never got it, so the student must be able to resend it
+        app.throttling.forget(user_id, message.video_note.file_unique_id)
+        app.outbox.enqueue(SendMessage(
+            chat_id=message.chat.id,
+            text=(
+                "❌ Kechirasiz, texnik nosozlik yuz berdi.\n"
+                "Iltimos, qaytadan urinib ko'ring."
+            )
+        ))
+
+    async def on_forward_failed(error):
+        if "info_msg_id" in sent:
+            # No video to grade under it
+            app.outbox.enqueue(DeleteMessage(chat_id=teacher_id, message_id=sent["info_msg_id"]))
+        await on_failed(error)
+
+    app.outbox.enqueue(
+        SendMessage(
+            chat_id=teacher_id,
+            text=f"{student_info}\n\n💫 Baho qo'yish uchun tanlang:"
+        ),
+        on_success=on_info_sent,
+        on_error=on_failed
+    )
+    app.outbox.enqueue(
+        ForwardMessage(
+            chat_id=teacher_id,
+            from_chat_id=message.chat.id,
+            message_id=message.message_id
+        ),
+        on_success=on_forwarded,
+        on_error=on_forward_failed
+    )
+
+async def process_grade(callback_query: CallbackQuery, app: App):
+    if not await app.teachers.is_teacher(callback_query.from_user.id):
+        await callback_query.answer("⚠️ Faqat o'qituvchi baho qo'ya oladi!")
+        return
+
+    parts = callback_query.data.split('_')
+    if len(parts) == 3:
+        # Buttons sent before submissions were keyed by chat carry only the message id
+        _, message_id, grade = parts
+        rows = await app.database.fetchall(
+            "SELECT chat_id FROM submissions WHERE message_id = ?", (int(message_id),)
+        )
+        chat_id = rows[0][0] if len(rows) == 1 else 0
+    else:
+        _, chat_id, message_id, grade = parts
+    key = (int(chat_id), int(message_id))
+    student_data = await app.submissions.get(*key)
+    
+    if not student_data:
+        await callback_query.answer("❌ Xatolik: Bu retelling topilmadi.")
+        return
+
+    grader_id = callback_query.from_user.id
+    if not app.teachers.is_head(grader_id) and student_data["teacher_id"] != grader_id:
+        await callback_query.answer("⚠️ Bu retelling boshqa o'qituvchiga yuborilgan!")
+        return
+
+    grade = int(grade)
+    graded = await save_grades(app, {key: grade})
+    if not graded:
+        await callback_query.answer("❌ Xatolik: Bu retelling topilmadi.")
+        return
+
+    result = graded[0]
+    app.outbox.enqueue(SendMessage(chat_id=result["user_id"], text=format_grade_message(result)))
+
+    # Update teacher's message
+    info_text = callback_query.message.text.split("Baho qo'yish uchun tanlang:")[0]
+    app.outbox.enqueue(EditMessageText(
+        chat_id=callback_query.message.chat.id,
+        message_id=callback_query.message.message_id,
+        text=f"{info_text}\n"
+             f"✅ Qo'yilgan baho: {grade} {'⭐️' * grade}"
+    ))
+
+    # Clean up
+    app.outbox.enqueue(DeleteMessage(
+        chat_id=callback_query.message.chat.id, message_id=result["forwarded_msg_id"]
+    ))
+    
+    await callback_query.answer("✅ Baho muvaffaqiyatli qo'yildi!")
+    await app.scheduler.schedule(
+        "delete_message",
+        {"chat_id": callback_query.message.chat.id, "message_id": callback_query.message.message_id},
+        delay=5
+    )
+
+
+async def save_grades(app, grades, teacher_id=None):
+    """Grade pending submissions ({(chat_id, message_id): grade}) in one transaction.
+
+    Submissions that were already graded or no longer exist are skipped, as
+    are those forwarded to someone other than `teacher_id` when it is given.
+    Returns one dict per graded submission with the student's updated totals.
+    """
+    keys = list(grades)
+    placeholders = ",".join(["(?, ?)"] * len(keys))
+    owner_filter, owner_params = "", ()
+    if teacher_id is not None:
+        owner_filter, owner_params = " AND teacher_id = ?", (teacher_id,)
+    current_time = int(time.time())
+
+    async with app.database.acquire() as db:
+        await db.execute("BEGIN IMMEDIATE")
+        async with db.execute(f"""
+            SELECT chat_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, teacher_id
+            FROM submissions
+            WHERE (chat_id, message_id) IN (VALUES {placeholders}){owner_filter}
+        """, [value for key in keys for value in key] + list(owner_params)) as cursor:
+            pending = await cursor.fetchall()
+
+        if not pending:
+            await db.rollback()
+            return []
+
+        await db.executemany("""
+        INSERT INTO grades (user_id, topic, grade, date)
+        VALUES (?, ?, ?, ?)
+        """, [(user_id, topic, grades[(chat_id, message_id)], current_time)
+              for chat_id, message_id, user_id, topic, _, _, _ in pending])
+
+        await db.executemany("""
+        UPDATE users SET current_topic = NULL
+        WHERE user_id = ?
+        """, [(user_id,) for _, _, user_id, _, _, _, _ in pending])
+
+        graded_keys = [(chat_id, message_id) for chat_id, message_id, *_ in pending]
+        await db.executemany(
+            "DELETE FROM submissions WHERE chat_id = ? AND message_id = ?", graded_keys
+        )
+        await db.commit()
+
+        # Student totals are kept up to date by the grades trigger
+        user_ids = list({user_id for _, _, user_id, _, _, _, _ in pending})
+        async with db.execute(f"""
+            SELECT user_id, total, grade_5, grade_4, grade_3, grade_2, grade_1
+            FROM student_stats
+            WHERE user_id IN ({",".join("?" * len(user_ids))})
+        """, user_ids) as cursor:
+            stats = {row[0]: row[1:] for row in await cursor.fetchall()}
+
+    app.submissions.forget(graded_keys)
+    app.profiles.topics_cleared(user_ids)
+    return [
+        {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "user_id": user_id,
+            "topic": topic,
+            "grade": grades[(chat_id, message_id)],
+            "forwarded_msg_id": forwarded_msg_id,
+            "info_msg_id": info_msg_id,
+            "teacher_id": owner or app.teachers.head_id,
+            "stats": stats.get(user_id, (0, 0, 0, 0, 0, 0)),
+        }
+        for chat_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, owner in pending
+    ]
+
+
+def format_grade_message(result):
+    grade = result["grade"]
+    stats = result["stats"]
+    return (
+        f"🎯 Sizning retelling bahoyingiz: {grade} {'⭐️' * grade}\n"
+        f"📚 Mavzu: {result['topic']}\n\n"
+        f"📊 Sizning umumiy natijalaringiz:\n"
+        f"📝 Jami topshirgan retellinglar: {stats[0]}\n"
+        f"5 baho: {stats[1] or 0} ta\n"
+        f"4 baho: {stats[2] or 0} ta\n"
+        f"3 baho: {stats[3] or 0} ta\n"
+        f"2 baho: {stats[4] or 0} ta\n"
+        f"1 baho: {stats[5] or 0} ta"
+    )
+
+
+QUEUE_PAGE_SIZE = 5
+
+async def render_queue_page(app, page, selected, teacher_id=None):
+    total = await app.submissions.count_pending(teacher_id)
+    pages = max(1, (total + QUEUE_PAGE_SIZE - 1) // QUEUE_PAGE_SIZE)
+    page = min(page, pages - 1)
+    rows = await app.submissions.list_pending(page * QUEUE_PAGE_SIZE, QUEUE_PAGE_SIZE, teacher_id)
+
+    text = f"📋 Baholanmagan retellinglar: {total} ta (sahifa {page + 1}/{pages})\n\n"
+    items = []
+    for number, (chat_id, message_id, topic, created_at, full_name, group_name) in enumerate(rows, page * QUEUE_PAGE_SIZE + 1):
+        submitted = datetime.fromtimestamp(created_at, TASHKENT).strftime("%d.%m %H:%M")
+        text += (
+            f"{number}. 👤 {full_name or '?'} ({group_name or '?'})\n"
+            f"    📚 {topic}\n"
+            f"    ⏰ {submitted}\n"
+        )
+        items.append((number, (chat_id, message_id)))
+
+    if selected:
+        text += f"\n✏️ Tanlangan baholar: {len(selected)} ta. Saqlash uchun 💾 tugmasini bosing."
+    keyboard = create_queue_keyboard(tuple(items), selected, page, total, QUEUE_PAGE_SIZE)
+    return text, keyboard
+
+async def show_queue(message: types.Message, state: FSMContext, app: App):
+    if not await app.teachers.is_teacher(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    # The head teacher sees every queue, other teachers only their own
+    owner = None if app.teachers.is_head(message.from_user.id) else message.from_user.id
+    await state.update_data(queue_grades={})
+    if not await app.submissions.count_pending(owner):
+        await message.answer("✅ Baholanmagan retellinglar yo'q.")
+        return
+    text, keyboard = await render_queue_page(app, 0, {}, owner)
+    await message.answer(text, reply_markup=keyboard)
+
+async def process_queue(callback_query: CallbackQuery, state: FSMContext, app: App):
+    if not await app.teachers.is_teacher(callback_query.from_user.id):
+        await callback_query.answer("⚠️ Faqat o'qituvchi baho qo'ya oladi!")
+        return
+
+    owner = None if app.teachers.is_head(callback_query.from_user.id) else callback_query.from_user.id
+    data = callback_query.data
+    selected = (await state.get_data()).get("queue_grades", {})
+
+    if data == "qnoop":
+        await callback_query.answer()
+        return
+
+    if data == "qsave":
+        if not selected:
+            await callback_query.answer("Hech qanday baho tanlanmagan.")
+            return
+        graded = await save_grades(
+            app, {tuple(map(int, k.split('_'))): v for k, v in selected.items()}, owner
+        )
+        for result in graded:
+            app.outbox.enqueue(SendMessage(chat_id=result["user_id"], text=format_grade_message(result)))
+            app.outbox.enqueue(DeleteMessage(chat_id=result["teacher_id"], message_id=result["forwarded_msg_id"]))
+            app.outbox.enqueue(DeleteMessage(chat_id=result["teacher_id"], message_id=result["info_msg_id"]))
+        await state.update_data(queue_grades={})
+        await callback_query.answer(f"✅ {len(graded)} ta baho saqlandi!")
+        if await app.submissions.count_pending(owner):
+            text, keyboard = await render_queue_page(app, 0, {}, owner)
+            await callback_query.message.edit_text(text, reply_markup=keyboard)
+        else:
+            await callback_query.message.edit_text("✅ Barcha retellinglar baholandi.")
+        return
+
+    if data.startswith("qgrade_"):
+        _, chat_id, message_id, grade, page = data.split('_')
+        key = f"{chat_id}_{message_id}"
+        if selected.get(key) == int(grade):
+            del selected[key]
+        else:
+            selected[key] = int(grade)
+        await state.update_data(queue_grades=selected)
+    elif data.startswith("qpage_"):
+        page = data.split('_')[1]
+    else:
+        await callback_query.answer()
+        return
+
+    text, keyboard = await render_queue_page(app, int(page), selected, owner)
+    await callback_query.message.edit_text(text, reply_markup=keyboard)
+    await callback_query.answer()
+
+
+def create_router():
+    router = Router(name="grading")
+    router.message.register(handle_video, F.video_note)
+    router.callback_query.register(process_grade, lambda c: c.data.startswith('grade_'))
+    router.message.register(show_queue, Command("queue"))
+    router.callback_query.register(process_queue, lambda c: c.data in ("qsave", "qnoop") or c.data.startswith(('qgrade_', 'qpage_')))
+    return router
@@ -0,0 +1,122 @@
+"""Student registration: /start, name, group choice and the retelling topic."""
+from aiogram import F, Router, types
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery
+
+from app import App
+from handlers.common import RegistrationStates, teacher_groups
+from keyboards import create_confirm_keyboard, create_group_keyboard, create_statistics_keyboard
+
+
+async def start_handler(message: types.Message, state: FSMContext, app: App):
+    user_id = message.from_user.id
+    user = await app.profiles.get(user_id)
+
+    if await app.teachers.is_teacher(user_id):
+        stats_keyboard = create_statistics_keyboard(await teacher_groups(app, user_id))
+        await message.answer(
+            "Assalomu alaykum, ustoz! Botga xush kelibsiz.\n"
+            "Guruh bo'yicha statistikani ko'rish uchun guruhni tanlang:",
+            reply_markup=stats_keyboard
+        )
+    elif user:
+        await state.set_state(RegistrationStates.WAITING_FOR_TOPIC)
+        await message.answer(
+            "Assalomu alaykum! Siz allaqachon ro'yxatdan o'tibsiz.\n"
+            "Retelling topshirish uchun yangi mavzu kiriting:"
+        )
+    else:
+        await state.set_state(RegistrationStates.WAITING_FOR_FULL_NAME)
+        await message.answer("Ism-familiyangizni kiriting:")
+
+async def process_full_name(message: types.Message, state: FSMContext, app: App):
+    full_name = message.text.strip()
+
+    if not full_name:
+        await message.answer("Ism familiya kiritilmadi. Iltimos, qaytadan urinib ko'ring.")
+        return
+
+    await state.update_data(full_name=full_name)
+    await state.set_state(RegistrationStates.WAITING_FOR_GROUP)
+    group_keyboard = create_group_keyboard(await app.group_registry.active())
+    await message.answer("Guruhingizni tanlang:", reply_markup=group_keyboard)
+
+async def process_page(callback_query: CallbackQuery, app: App):
+    page = int(callback_query.data.split('_')[1])
+    groups = await app.group_registry.active()
+    await callback_query.message.edit_reply_markup(reply_markup=create_group_keyboard(groups, page))
+    await callback_query.answer()
+
+async def process_group_selection(callback_query: CallbackQuery):
+    user_id = callback_query.from_user.id
+    group = callback_query.data.split('_')[1]
+    
+    confirm_keyboard = create_confirm_keyboard(group)
+    await callback_query.message.edit_text(
+        f"Siz {group}-guruhni tanladingiz.\nShu guruhda o'qiysizmi?",
+        reply_markup=confirm_keyboard
+    )
+    await callback_query.answer()
+
+async def process_group_confirmation(callback_query: CallbackQuery, state: FSMContext, app: App):
+    user_id = callback_query.from_user.id
+    group = callback_query.data.split('_')[2]
+    
+    data = await state.get_data()
+    if "full_name" not in data:
+        await callback_query.message.answer("Xatolik yuz berdi. /start buyrug'ini qayta yuboring.")
+        return
+
+    full_name = data["full_name"]
+
+    if not await app.group_registry.is_active(group):
+        await callback_query.answer("Bu guruh mavjud emas. Boshqa guruhni tanlang.")
+        return
+    
+    await app.profiles.register(user_id, full_name, callback_query.from_user.username, group)
+
+    await state.set_data({})
+    await state.set_state(RegistrationStates.WAITING_FOR_TOPIC)
+    await callback_query.message.edit_text(
+        f"Ro'yxatdan o'tdingiz!\n"
+        f"Ism familiya: {full_name}\n"
+        f"Guruh: {group}\n\n"
+        "Endi retelling mavzusini kiriting:"
+    )
+    await callback_query.answer()
+
+async def process_group_cancellation(callback_query: CallbackQuery, app: App):
+    user_id = callback_query.from_user.id
+    group_keyboard = create_group_keyboard(await app.group_registry.active())
+    await callback_query.message.edit_text("Guruhingizni tanlang:", reply_markup=group_keyboard)
+    await callback_query.answer()
+
+async def process_topic(message: types.Message, state: FSMContext, app: App):
+    user_id = message.from_user.id
+    topic = message.text.strip()
+
+    if not topic:
+        await message.answer("Mavzu kiritilmadi. Iltimos, mavzuni kiriting:")
+        return
+
+    await app.profiles.set_topic(user_id, topic)
+
+    await state.set_state(RegistrationStates.WAITING_FOR_VIDEO)
+    await message.answer(
+        f"Retelling mavzusi qabul qilindi: {topic}\n\n"
+        "Endi shu mavzu bo'yicha video xabar yuborishingiz mumkin.\n"
+        "⚠️ Video yuborilgandan so'ng mavzu o'chirilib, yangi mavzu kiritishingiz kerak bo'ladi."
+    )
+
+
+def create_router():
+    router = Router(name="registration")
+    router.message.register(start_handler, Command("start"))
+    router.message.register(process_full_name, RegistrationStates.WAITING_FOR_FULL_NAME, F.text)
+    router.callback_query.register(process_page, lambda c: c.data.startswith('page_'))
+    router.callback_query.register(process_group_selection, lambda c: c.data.startswith('group_'))
+    router.callback_query.register(process_group_confirmation, lambda c: c.data.startswith('confirm_group_'))
+    router.callback_query.register(process_group_cancellation, lambda c: c.data == "cancel_group")
+    router.message.register(process_topic, RegistrationStates.WAITING_FOR_TOPIC, F.text)
+    return router
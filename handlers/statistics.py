@@ -0,0 +1,497 @@
+"""Teacher reports: group statistics, /monthly, /export, /stats and /digest."""
+from datetime import datetime
+
+from aiogram import Router, types
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery
+
+import clock
+from app import App
+from digests import DIGEST_KINDS, DIGEST_SETTINGS
+from export import SpooledInputFile, export_grades_csv
+from handlers.common import can_view_group, teacher_groups, teacher_scope
+from keyboards import create_monthly_groups_keyboard, create_monthly_menu_keyboard, create_statistics_keyboard
+from renderer import format_change, keyset_rows, page_sender, send_pages
+from stats import (
+    get_range_stats,
+    get_range_totals,
+    get_topic_stats,
+    group_students_query,
+    student_range_query,
+    student_sort_key,
+)
+
+
+async def process_statistics_page(callback_query: CallbackQuery, app: App):
+    page = int(callback_query.data.split('_')[1])
+    groups = await teacher_groups(app, callback_query.from_user.id)
+    await callback_query.message.edit_reply_markup(reply_markup=create_statistics_keyboard(groups, page))
+    await callback_query.answer()
+
+async def process_monthly_page(callback_query: CallbackQuery, app: App):
+    page = int(callback_query.data.split('_')[1])
+    groups = await teacher_groups(app, callback_query.from_user.id)
+    await callback_query.message.edit_reply_markup(reply_markup=create_monthly_groups_keyboard(groups, page))
+    await callback_query.answer()
+
+async def get_group_average(db, group):
+    # Students without grades count as a single 0, as in the original AVG over the join
+    async with db.execute("""
+        SELECT 
+            ROUND(grade_sum * 1.0 / NULLIF(total + ungraded_students, 0), 1) as avg_grade,
+            students as total_students,
+            total as total_retellings
+        FROM group_stats
+        WHERE group_name = ?
+    """, (group,)) as cursor:
+        return await cursor.fetchone() or (None, 0, 0)
+
+# The original main.py registered two "stats_" handlers and aiogram ran the
+# first: students by name with grade counts only.  This is the second,
+# detailed report (group header with the average, students best average
+# first, each with their own average), which is what teachers now see.
+async def show_group_statistics(callback_query: CallbackQuery, app: App):
+    if not await app.teachers.is_teacher(callback_query.from_user.id):
+        await callback_query.answer("Bu funksiya faqat o'qituvchi uchun!")
+        return
+
+    group = callback_query.data.split('_')[1]
+    if not await can_view_group(app, callback_query.from_user.id, group):
+        await callback_query.answer("Bu guruh sizga biriktirilmagan!")
+        return
+
+    async with app.database.acquire() as db:
+        # Get group average statistics
+        group_stats = await get_group_average(db, group)
+
+    # Individual student statistics, read in chunks between the pages
+    rows = keyset_rows(
+        app.database, lambda after, limit: group_students_query(group, after, limit), student_sort_key
+    )
+
+    async def student_blocks():
+        async for name, total, avg, grade5, grade4, grade3, grade2, grade1, _ in rows:
+            yield (
+                f"👤 {name}\n"
+                f"📊 O'rtacha ball: {avg or 0}\n"
+                f"📝 Jami topshirgan: {total or 0} ta\n"
+                f"5️⃣ - {grade5 or 0} ta\n"
+                f"4️⃣ - {grade4 or 0} ta\n"
+                f"3️⃣ - {grade3 or 0} ta\n"
+                f"2️⃣ - {grade2 or 0} ta\n"
+                f"1️⃣ - {grade1 or 0} ta\n"
+                f"{'─' * 30}\n"
+            )
+
+    avg_grade, total_students, total_retellings = group_stats
+    pages = await send_pages(
+        page_sender(app.outbox, callback_query.message),
+        student_blocks(),
+        header=(
+            f"📊 {group}-guruh statistikasi:\n\n"
+            f"👥 Jami o'quvchilar: {total_students} ta\n"
+            f"📝 Jami topshirilgan retellinglar: {total_retellings} ta\n"
+            f"⭐️ O'rtacha ball: {avg_grade}\n"
+            f"{'─' * 30}\n\n"
+        )
+    )
+
+    if not pages:
+        await callback_query.message.answer(f"❌ {group}-guruhda hali o'quvchilar yo'q.")
+        return
+    
+    await callback_query.answer()
+
+
+# Add monthly statistics function
+def parse_month(text):
+    """"YYYY-MM" -> (year, month), or None if it is not a month."""
+    try:
+        parsed = datetime.strptime(text, "%Y-%m")
+    except ValueError:
+        return None
+    return parsed.year, parsed.month
+
+def current_month():
+    period = clock.current_period()
+    return period.year, period.month
+
+def parse_day(text):
+    """"YYYY-MM-DD" -> date, or None."""
+    try:
+        return datetime.strptime(text, "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def month_days(month=None):
+    """First and last "YYYY-MM-DD" day of a (year, month), the current one by default."""
+    return clock.month_days(*(month or current_month()))
+
+def monthly_filter(groups=None, month=None):
+    """WHERE clause (over grades g and users u) for one Tashkent calendar month.
+
+    `groups` limits it to those group names (None means every group) and
+    `month` is a (year, month) tuple defaulting to the current month.
+    """
+    where = "g.date >= ? AND g.date < ?"
+    params = clock.month_bounds(*(month or current_month()))
+    if groups is not None:
+        where += f" AND u.group_name IN ({','.join('?' * len(groups))})"
+        params += tuple(groups)
+    return where, params
+
+async def get_monthly_statistics(db, groups=None, month=None):
+    # Served from daily_rollup: O(days x students) rows instead of every grade
+    first_day, last_day = month_days(month)
+    return await get_range_stats(db, first_day, last_day, groups)
+
+# Add new command for monthly statistics
+async def show_monthly_stats(message: types.Message, app: App):
+    if not await app.teachers.is_teacher(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    await message.answer(
+        "Oylik statistikani ko'rish uchun tanlang:",
+        reply_markup=create_monthly_menu_keyboard()
+    )
+
+async def process_monthly_stats(callback_query: CallbackQuery, app: App):
+    if not await app.teachers.is_teacher(callback_query.from_user.id):
+        await callback_query.answer("Bu funksiya faqat o'qituvchi uchun!")
+        return
+
+    if callback_query.data == "monthly_by_group":
+        # Show group selection keyboard for monthly stats
+        await callback_query.message.edit_text(
+            "Guruhni tanlang:",
+            reply_markup=create_monthly_groups_keyboard(await teacher_groups(app, callback_query.from_user.id))
+        )
+    else:  # all groups
+        async with app.database.acquire() as db:
+            stats = await get_monthly_statistics(db, await teacher_scope(app, callback_query.from_user.id))
+            
+        if not stats:
+            await callback_query.message.edit_text("Bu oy uchun ma'lumotlar topilmadi.")
+            return
+            
+        month_name = clock.current_period().month_name
+
+        async def group_blocks():
+            for group, students, retellings, avg, g5, g4, g3, g2, g1 in stats:
+                yield (
+                    f"👥 {group}-guruh:\n"
+                    f"📚 O'quvchilar: {students} ta\n"
+                    f"📝 Retellinglar: {retellings or 0} ta\n"
+                    f"⭐️ O'rtacha ball: {avg or 0}\n"
+                    f"5️⃣ - {g5 or 0} ta\n"
+                    f"4️⃣ - {g4 or 0} ta\n"
+                    f"3️⃣ - {g3 or 0} ta\n"
+                    f"2️⃣ - {g2 or 0} ta\n"
+                    f"1️⃣ - {g1 or 0} ta\n"
+                    f"{'─' * 30}\n"
+                )
+
+        await send_pages(
+            page_sender(app.outbox, callback_query.message, edit_first=True),
+            group_blocks(),
+            header=f"📊 {month_name} oyi uchun statistika:\n\n"
+        )
+    
+    await callback_query.answer()
+
+async def show_group_monthly_stats(callback_query: CallbackQuery, app: App):
+    if not await app.teachers.is_teacher(callback_query.from_user.id):
+        await callback_query.answer("Bu funksiya faqat o'qituvchi uchun!")
+        return
+
+    group = callback_query.data.split('_')[2]
+    if not await can_view_group(app, callback_query.from_user.id, group):
+        await callback_query.answer("Bu guruh sizga biriktirilmagan!")
+        return
+
+    async with app.database.acquire() as db:
+        # Get monthly group statistics
+        stats = await get_monthly_statistics(db, (group,))
+
+    if not stats:
+        await callback_query.message.edit_text(
+            f"❌ {group}-guruh uchun bu oy ma'lumotlar topilmadi."
+        )
+        return
+
+    _, students_count, retellings, avg, g5, g4, g3, g2, g1 = stats[0]
+    month_name = clock.current_period().month_name
+    header = (
+        f"📊 {group}-guruh, {month_name} oyi statistikasi:\n\n"
+        f"📚 Jami o'quvchilar: {students_count} ta\n"
+        f"📝 Jami retellinglar: {retellings or 0} ta\n"
+        f"⭐️ O'rtacha ball: {avg or 0}\n"
+        f"5️⃣ - {g5 or 0} ta\n"
+        f"4️⃣ - {g4 or 0} ta\n"
+        f"3️⃣ - {g3 or 0} ta\n"
+        f"2️⃣ - {g2 or 0} ta\n"
+        f"1️⃣ - {g1 or 0} ta\n"
+        f"{'─' * 30}\n\n"
+        f"👤 O'quvchilar bo'yicha:\n\n"
+    )
+
+    days = month_days()
+    rows = keyset_rows(
+        app.database, lambda after, limit: student_range_query(*days, group, after, limit), student_sort_key
+    )
+
+    async def student_blocks():
+        async for name, total, avg, g5, g4, g3, g2, g1, _ in rows:
+            yield (
+                f"📌 {name}\n"
+                f"📊 O'rtacha: {avg or 0}\n"
+                f"📝 Topshirgan: {total or 0} ta\n"
+                f"5️⃣ - {g5 or 0} ta\n"
+                f"4️⃣ - {g4 or 0} ta\n"
+                f"3️⃣ - {g3 or 0} ta\n"
+                f"2️⃣ - {g2 or 0} ta\n"
+                f"1️⃣ - {g1 or 0} ta\n"
+                f"{'─' * 30}\n"
+            )
+
+    await send_pages(
+        page_sender(app.outbox, callback_query.message, edit_first=True),
+        student_blocks(),
+        header=header
+    )
+    
+    await callback_query.answer()
+
+async def export_grades(message: types.Message, app: App):
+    if not await app.teachers.is_teacher(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    group, month = None, None
+    for arg in message.text.split()[1:]:
+        if parse_month(arg) and month is None:
+            month = parse_month(arg)
+        elif group is None:
+            group = arg
+        else:
+            await message.answer("Foydalanish: /export [guruh] [YYYY-MM]")
+            return
+
+    if group and not await can_view_group(app, message.from_user.id, group):
+        await message.answer("Bu guruh sizga biriktirilmagan!")
+        return
+
+    groups = (group,) if group else await teacher_scope(app, message.from_user.id)
+    where, params = monthly_filter(groups, month)
+    async with app.database.acquire() as db:
+        spool, rows = await export_grades_csv(db, where, params, clock.TASHKENT)
+
+    try:
+        if not rows:
+            await message.answer("❌ Bu davr uchun ma'lumotlar topilmadi.")
+            return
+        year, month = month or current_month()
+        filename = f"grades_{group or 'all'}_{year}-{month:02d}.csv"
+        await message.answer_document(
+            SpooledInputFile(spool, filename),
+            caption=f"📄 {rows} ta baho"
+        )
+    finally:
+        spool.close()
+
+STATS_USAGE = (
+    "Foydalanish:\n"
+    "/stats [guruh] [YYYY-MM-DD..YYYY-MM-DD | YYYY-MM] - davr bo'yicha statistika\n"
+    "/stats week [guruh] - shu hafta va o'tgan hafta\n"
+    "/stats topics [guruh] [davr] - mavzular bo'yicha"
+)
+
+def parse_stats_args(args):
+    """Split /stats arguments into (mode, group, first_day, last_day); None if invalid.
+
+    The period defaults to the current month up to today.
+    """
+    mode = "range"
+    if args and args[0] in ("week", "topics"):
+        mode, args = args[0], args[1:]
+
+    group, period = None, None
+    for arg in args:
+        if ".." in arg:
+            first, _, last = arg.partition("..")
+            first, last = parse_day(first), parse_day(last)
+            if not first or not last or first > last or period:
+                return None
+            period = (first.isoformat(), last.isoformat())
+        elif parse_month(arg) and not period:
+            period = month_days(parse_month(arg))
+        elif parse_day(arg) and not period:
+            period = (arg, arg)
+        elif group is None:
+            group = arg
+        else:
+            return None
+
+    if period is None:
+        current = clock.current_period()
+        period = (current.month_first_day, current.day)
+    return mode, group, *period
+
+async def show_range_stats(message: types.Message, app: App):
+    if not await app.teachers.is_teacher(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    parsed = parse_stats_args(message.text.split()[1:])
+    if parsed is None:
+        await message.answer(STATS_USAGE)
+        return
+    mode, group, first_day, last_day = parsed
+    if group and not await can_view_group(app, message.from_user.id, group):
+        await message.answer("Bu guruh sizga biriktirilmagan!")
+        return
+    groups = (group,) if group else await teacher_scope(app, message.from_user.id)
+    title = f"{group}-guruh" if group else "Barcha guruhlar"
+
+    if mode == "week":
+        current = clock.current_period()
+        async with app.database.acquire() as db:
+            this_week = await get_range_totals(db, current.days_ago(6), current.day, groups)
+            last_week = await get_range_totals(db, current.days_ago(13), current.days_ago(7), groups)
+        students, total, avg = this_week
+        prev_students, prev_total, prev_avg = last_week
+        await message.answer(
+            f"📊 {title}: oxirgi 7 kun / undan oldingi 7 kun\n\n"
+            f"📝 Retellinglar: {total} ta / {prev_total} ta ({format_change(total, prev_total)})\n"
+            f"👥 Topshirgan o'quvchilar: {students} ta / {prev_students} ta "
+            f"({format_change(students, prev_students)})\n"
+            f"⭐️ O'rtacha ball: {avg or 0} / {prev_avg or 0}"
+        )
+        return
+
+    header = f"📊 {title}, {first_day} — {last_day}:\n\n"
+    if mode == "topics":
+        async with app.database.acquire() as db:
+            rows = await get_topic_stats(db, first_day, last_day, groups)
+
+        async def blocks():
+            for topic, students, total, avg, g5, g4, g3, g2, g1 in rows:
+                yield (
+                    f"📚 {topic}\n"
+                    f"👥 O'quvchilar: {students} ta, 📝 {total} ta, ⭐️ {avg or 0}\n"
+                    f"5️⃣ {g5} · 4️⃣ {g4} · 3️⃣ {g3} · 2️⃣ {g2} · 1️⃣ {g1}\n"
+                    f"{'─' * 30}\n"
+                )
+    elif group:
+        rows = keyset_rows(
+            app.database,
+            lambda after, limit: student_range_query(first_day, last_day, group, after, limit),
+            student_sort_key
+        )
+
+        async def blocks():
+            async for name, total, avg, g5, g4, g3, g2, g1, _ in rows:
+                yield (
+                    f"📌 {name}\n"
+                    f"📝 {total} ta, ⭐️ {avg or 0}\n"
+                    f"5️⃣ {g5} · 4️⃣ {g4} · 3️⃣ {g3} · 2️⃣ {g2} · 1️⃣ {g1}\n"
+                    f"{'─' * 30}\n"
+                )
+    else:
+        async with app.database.acquire() as db:
+            rows = await get_range_stats(db, first_day, last_day, groups)
+
+        async def blocks():
+            for name, students, total, avg, g5, g4, g3, g2, g1 in rows:
+                yield (
+                    f"👥 {name}-guruh\n"
+                    f"📚 O'quvchilar: {students} ta, 📝 {total} ta, ⭐️ {avg or 0}\n"
+                    f"5️⃣ {g5} · 4️⃣ {g4} · 3️⃣ {g3} · 2️⃣ {g2} · 1️⃣ {g1}\n"
+                    f"{'─' * 30}\n"
+                )
+
+    pages = await send_pages(page_sender(app.outbox, message), blocks(), header=header)
+
+    if not pages:
+        await message.answer("❌ Bu davr uchun ma'lumotlar topilmadi.")
+
+DIGEST_USAGE = (
+    "Foydalanish:\n"
+    "/digest <guruh> [week | month] - oxirgi haftalik va oylik hisobot\n"
+    "/digestset <guruh> <both | weekly | monthly | off> [soat] - hisobotlarni yuborish"
+)
+
+async def show_digest(message: types.Message, app: App):
+    if not await app.teachers.is_teacher(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    args = message.text.split()[1:]
+    if not args:
+        lines = []
+        for group in await teacher_groups(app, message.from_user.id):
+            setting, hour = await app.group_registry.digest_of(group)
+            hour = app.config.digest_send_hour if hour is None else hour
+            lines.append(f"👥 {group}: {setting}, {hour:02d}:00")
+        await message.answer(
+            "📅 Haftalik va oylik hisobotlar (guruh: turi, yuborish vaqti):\n"
+            + ("\n".join(lines) or "-") + "\n\n" + DIGEST_USAGE
+        )
+        return
+    if len(args) > 2 or (len(args) == 2 and args[1] not in ("week", "month")):
+        await message.answer(DIGEST_USAGE)
+        return
+
+    group = args[0]
+    if not await can_view_group(app, message.from_user.id, group):
+        await message.answer("Bu guruh sizga biriktirilmagan!")
+        return
+
+    kinds = DIGEST_KINDS if len(args) == 1 else ({"week": "weekly", "month": "monthly"}[args[1]],)
+    for kind in kinds:
+        # Completed periods are stored once built, so repeat views cost no aggregation
+        key, text = await app.digests.get(kind, group)
+        await message.answer(text or f"❌ {group}-guruh uchun {key} hisoboti uchun ma'lumotlar topilmadi.")
+
+async def set_digest(message: types.Message, app: App):
+    if not await app.teachers.is_teacher(message.from_user.id):
+        await message.answer("Bu buyruq faqat o'qituvchi uchun!")
+        return
+
+    args = message.text.split()[1:]
+    if (
+        len(args) not in (2, 3) or args[1] not in DIGEST_SETTINGS
+        or (len(args) == 3 and not (args[2].isdigit() and int(args[2]) <= 23))
+    ):
+        await message.answer(DIGEST_USAGE)
+        return
+
+    group, setting = args[0], args[1]
+    hour = int(args[2]) if len(args) == 3 else None
+    if not await can_view_group(app, message.from_user.id, group):
+        await message.answer("Bu guruh sizga biriktirilmagan!")
+        return
+
+    if not await app.group_registry.set_digest(group, setting, hour):
+        await message.answer(f"❌ {group}-guruh topilmadi.")
+    elif setting == "off":
+        await message.answer(f"✅ {group}-guruh hisobotlari o'chirildi.")
+    else:
+        hour = app.config.digest_send_hour if hour is None else hour
+        await message.answer(f"✅ {group}-guruh hisobotlari ({setting}) soat {hour:02d}:00 da yuboriladi.")
+
+
+def create_router():
+    router = Router(name="statistics")
+    router.callback_query.register(process_statistics_page, lambda c: c.data.startswith('statspage_'))
+    router.callback_query.register(process_monthly_page, lambda c: c.data.startswith('monthlypage_'))
+    router.callback_query.register(show_group_statistics, lambda c: c.data.startswith('stats_'))
+    router.message.register(show_monthly_stats, Command("monthly"))
+    router.callback_query.register(process_monthly_stats, lambda c: c.data in ("monthly_all", "monthly_by_group"))
+    router.callback_query.register(show_group_monthly_stats, lambda c: c.data.startswith('monthly_group_'))
+    router.message.register(export_grades, Command("export"))
+    router.message.register(show_range_stats, Command("stats"))
+    router.message.register(show_digest, Command("digest"))
+    router.message.register(set_digest, Command("digestset"))
+    return router
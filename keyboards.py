@@ -0,0 +1,155 @@
+"""Inline keyboards, built once and reused.
+
+aiogram markups are mutable pydantic models; a single instance is shared
+between updates only because nothing modifies a markup after building it,
+so callers must not change the returned objects.  Group keyboards are
+memoized on the group tuple itself: a changed group list is a different
+cache key, and `reset_keyboard_cache()` drops everything explicitly.
+"""
+from functools import lru_cache
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+GRADES = (5, 4, 3, 2, 1)
+
+
+def _navigation_row(prefix, page, items_per_page, total):
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton(text="⬅️ Orqaga", callback_data=f"{prefix}_{page-1}"))
+    if (page + 1) * items_per_page < total:
+        navigation.append(InlineKeyboardButton(text="Oldinga ➡️", callback_data=f"{prefix}_{page+1}"))
+    return navigation
+
+
+@lru_cache(maxsize=256)
+def create_group_keyboard(groups, page=0, items_per_page=8):
+    page_groups = groups[page * items_per_page:(page + 1) * items_per_page]
+    keyboard = []
+    row = []
+
+    for i, group in enumerate(page_groups):
+        row.append(InlineKeyboardButton(text=group, callback_data=f"group_{group}"))
+        if len(row) == 2 or i == len(page_groups) - 1:
+            keyboard.append(row)
+            row = []
+
+    navigation = _navigation_row("page", page, items_per_page, len(groups))
+    if navigation:
+        keyboard.append(navigation)
+
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+@lru_cache(maxsize=256)
+def create_confirm_keyboard(group):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Ha", callback_data=f"confirm_group_{group}"),
+                InlineKeyboardButton(text="❌ Yo'q", callback_data="cancel_group")
+            ]
+        ]
+    )
+
+
+@lru_cache(maxsize=256)
+def create_statistics_keyboard(groups, page=0, items_per_page=30):
+    page_groups = groups[page * items_per_page:(page + 1) * items_per_page]
+    keyboard = []
+    row = []
+
+    for i, group in enumerate(page_groups):
+        row.append(InlineKeyboardButton(text=group, callback_data=f"stats_{group}"))
+        if len(row) == 3 or i == len(page_groups) - 1:
+            keyboard.append(row)
+            row = []
+
+    navigation = _navigation_row("statspage", page, items_per_page, len(groups))
+    if navigation:
+        keyboard.append(navigation)
+
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+@lru_cache(maxsize=1)
+def create_monthly_menu_keyboard():
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="📊 Umumiy statistika", callback_data="monthly_all")],
+            [InlineKeyboardButton(text="👥 Guruh bo'yicha", callback_data="monthly_by_group")]
+        ]
+    )
+
+
+@lru_cache(maxsize=256)
+def create_monthly_groups_keyboard(groups, page=0, items_per_page=10):
+    page_groups = groups[page * items_per_page:(page + 1) * items_per_page]
+    keyboard = [
+        [InlineKeyboardButton(text=group, callback_data=f"monthly_group_{group}")]
+        for group in page_groups
+    ]
+
+    navigation = _navigation_row("monthlypage", page, items_per_page, len(groups))
+    if navigation:
+        keyboard.append(navigation)
+
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+# Only callback_data differs between grade keyboards, so the buttons are
+# validated once here and copied with the per-video callback_data.
+_GRADE_BUTTON_TEMPLATES = tuple(
+    (grade, InlineKeyboardButton(text=f"{grade} ⭐️", callback_data=f"grade_0_0_{grade}"))
+    for grade in GRADES
+)
+
+
+def create_grade_keyboard(chat_id, message_id):
+    """Grade buttons for the video `message_id` sent in the student's `chat_id`."""
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                button.model_copy(update={"callback_data": f"grade_{chat_id}_{message_id}_{grade}"})
+                for grade, button in _GRADE_BUTTON_TEMPLATES
+            ]
+        ]
+    )
+
+
+def create_queue_keyboard(items, selected, page, total, items_per_page):
+    """Grading rows for one /queue page.
+
+    `items` are (number, (chat_id, message_id)) pairs; `selected` maps
+    "chat_id_message_id" -> chosen grade.
+    """
+    keyboard = []
+    for number, (chat_id, message_id) in items:
+        key = f"{chat_id}_{message_id}"
+        chosen = selected.get(key)
+        row = [InlineKeyboardButton(text=f"{number}.", callback_data="qnoop")]
+        for grade in GRADES:
+            text = f"✅{grade}" if grade == chosen else str(grade)
+            row.append(InlineKeyboardButton(text=text, callback_data=f"qgrade_{key}_{grade}_{page}"))
+        keyboard.append(row)
+
+    navigation = _navigation_row("qpage", page, items_per_page, total)
+    if navigation:
+        keyboard.append(navigation)
+    if selected:
+        keyboard.append([
+            InlineKeyboardButton(text=f"💾 Saqlash ({len(selected)} ta)", callback_data="qsave")
+        ])
+    return InlineKeyboardMarkup(inline_keyboard=keyboard)
+
+
+def reset_keyboard_cache():
+    """Drop every memoized markup, e.g. after the group list changed."""
+    for cached in (
+        create_group_keyboard,
+        create_confirm_keyboard,
+        create_statistics_keyboard,
+        create_monthly_menu_keyboard,
+        create_monthly_groups_keyboard,
+    ):
+        cached.cache_clear()
@@ -0,0 +1,119 @@
+"""Non-blocking, structured logging.
+
+Handlers on the event loop thread only enqueue records; a QueueListener
+thread formats them and does the file and console I/O.  The log file holds
+one JSON object per line and rotates both daily and when it grows past a
+size limit.  Records logged while an update is being handled carry its
+update id and user id (see LogContextMiddleware).
+"""
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+from datetime import datetime, timezone
+
+# (update_id, user_id) of the update the current task is handling
+log_context = contextvars.ContextVar("log_context", default=(None, None))
+
+CONSOLE_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        update_id = getattr(record, "update_id", None)
+        if update_id is not None:
+            entry["update_id"] = update_id
+        user_id = getattr(record, "user_id", None)
+        if user_id is not None:
+            entry["user_id"] = user_id
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that captures the update context and leaves formatting to the listener.
+
+    Only the message arguments and traceback are rendered here (they may
+    reference objects that change after the call); building the JSON line
+    happens on the listener thread.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.update_id, record.user_id = log_context.get()
+        record.msg = record.message = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class RotatingJsonFileHandler(logging.handlers.TimedRotatingFileHandler):
+    """Rotate at `when` like TimedRotatingFileHandler, and also once the file reaches `max_bytes`.
+
+    A size rollover within the same interval gets a numeric suffix
+    (bot1.log.2024-05-01.001) instead of overwriting the earlier backup.
+    """
+
+    def __init__(self, filename, when="midnight", backup_count=14, max_bytes=0, utc=False):
+        super().__init__(filename, when=when, backupCount=backup_count, encoding="utf-8", delay=True, utc=utc)
+        self.max_bytes = max_bytes
+        self.setFormatter(JsonFormatter())
+
+    def shouldRollover(self, record):
+        if super().shouldRollover(record):
+            return True
+        if self.max_bytes <= 0:
+            return False
+        if os.path.exists(self.baseFilename) and not os.path.isfile(self.baseFilename):
+            return False
+        if self.stream is None:
+            self.stream = self._open()
+        return self.stream.tell() + len(self.format(record)) + 1 >= self.max_bytes
+
+    def rotation_filename(self, default_name):
+        name = super().rotation_filename(default_name)
+        candidate, n = name, 1
+        while os.path.exists(candidate):
+            candidate = f"{name}.{n:03d}"
+            n += 1
+        return candidate
+
+
+def setup_logging(path, level=logging.INFO, max_bytes=10 * 1024 * 1024, backup_count=14, when="midnight"):
+    """Route the root logger through a queue to the file and console handlers.
+
+    Returns the started QueueListener; call its stop() at shutdown so queued
+    records are written out.
+    """
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+    file_handler = RotatingJsonFileHandler(path, when=when, backup_count=backup_count, max_bytes=max_bytes)
+
+    records = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, file_handler, console, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(ContextQueueHandler(records))
+    root.setLevel(level)
+
+    listener.start()
+    return listener
@@ -0,0 +1,189 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Histograms and counters are plain dicts keyed by label values, so recording
+is a bisect and a few additions.  `Metrics` bundles the instruments the bot
+records: per-update and per-handler latency, SQLite statement and pool wait
+times, and Bot API request latency and errors.
+"""
+import bisect
+import re
+import time
+from functools import lru_cache
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_TABLE_RE = re.compile(r"\b(?:FROM|INTO|UPDATE|TABLE|ON)\s+(?:IF\s+(?:NOT\s+)?EXISTS\s+)?(\w+)", re.I)
+
+
+@lru_cache(maxsize=512)
+def query_label(sql):
+    """Low-cardinality label for a statement: its verb and first table."""
+    words = sql.split(None, 1)
+    if not words:
+        return "?"
+    match = _TABLE_RE.search(sql)
+    verb = words[0].upper()
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values = {}
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def total(self):
+        return sum(self._values.values())
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        for labels, value in self._values.items():
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+
+    def observe(self, value, *labels):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def series(self):
+        return list(self._series)
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return series[2] if series else 0
+
+    def quantile(self, q, labels=None):
+        """Estimate the q-quantile of one series, or of all of them if `labels` is None.
+
+        Linear interpolation inside the bucket, as Prometheus' histogram_quantile
+        does; values above the last bucket are reported as its bound.
+        """
+        if labels is None:
+            picked = list(self._series.values())
+        else:
+            picked = [self._series[labels]] if labels in self._series else []
+        counts = [sum(s[0][i] for s in picked) for i in range(len(self.buckets) + 1)]
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for i, bucket_count in enumerate(counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, (counts, total_sum, count) in self._series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += bucket_count
+                le = bound if bound == "+Inf" else _number(float(bound))
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, (('le', le),))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total_sum)}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {count}"
+
+
+class CallbackMetric:
+    """Gauge or counter whose value is read from `fn()` at scrape time."""
+
+    def __init__(self, name, help, fn, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.kind = kind
+
+    def render(self):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield f"{self.name} {_number(self.fn())}"
+
+
+class Metrics:
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.updates = Histogram(
+            "bot_update_duration_seconds", "Time to process one update", ("type",)
+        )
+        self.handlers = Histogram(
+            "bot_handler_duration_seconds", "Time spent in each handler", ("handler",)
+        )
+        self.handler_errors = Counter(
+            "bot_handler_errors_total", "Exceptions raised by handlers", ("handler", "error")
+        )
+        self.queries = Histogram(
+            "bot_db_query_duration_seconds", "SQLite statement execution time", ("query",)
+        )
+        self.pool_wait = Histogram(
+            "bot_db_pool_wait_seconds", "Time spent waiting for a free database connection"
+        )
+        self.api_requests = Histogram(
+            "bot_api_request_duration_seconds", "Bot API request latency", ("method",)
+        )
+        self.api_errors = Counter(
+            "bot_api_errors_total", "Failed Bot API requests", ("method", "error")
+        )
+        self.throttled = Counter(
+            "bot_throttled_messages_total", "Messages dropped by the throttling middleware", ("reason",)
+        )
+        self._instruments = [
+            self.updates, self.handlers, self.handler_errors,
+            self.queries, self.pool_wait, self.api_requests, self.api_errors,
+            self.throttled,
+        ]
+
+    def register(self, name, help, fn, kind="gauge"):
+        """Expose a value computed at scrape time, e.g. a queue depth."""
+        self._instruments.append(CallbackMetric(name, help, fn, kind))
+
+    def observe_query(self, sql, seconds):
+        self.queries.observe(seconds, query_label(sql))
+
+    def observe_pool_wait(self, seconds):
+        self.pool_wait.observe(seconds)
+
+    @property
+    def uptime(self):
+        return time.monotonic() - self.started_at
+
+    def render(self):
+        lines = []
+        for instrument in self._instruments:
+            lines.extend(instrument.render())
+        return "\n".join(lines) + "\n"
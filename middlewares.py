@@ -0,0 +1,213 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+
+from logconfig import log_context
+
+
+class PerUserOrderMiddleware(BaseMiddleware):
+    """Handle one update at a time per user, in arrival order.
+
+    Updates are processed as concurrent tasks (polling and the webhook
+    handler both do this), so without it two quick messages from the same
+    student could race on their FSM state.  Different users still run in
+    parallel.  Register it as an outer `update` middleware.
+    """
+
+    def __init__(self):
+        # user_id -> [lock, number of updates holding or waiting for it]
+        self._locks = {}
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        entry = self._locks.get(user.id)
+        if entry is None:
+            entry = self._locks[user.id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                return await handler(event, data)
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[user.id]
+
+
+class _UserWindow:
+    __slots__ = ("hits", "seen", "warned_at")
+
+    def __init__(self, dedupe_size):
+        # bucket -> deque of recent timestamps, at most `limit` long (a ring buffer)
+        self.hits = {}
+        # (file_unique_id, seen_at) of recent video notes
+        self.seen = deque(maxlen=dedupe_size)
+        self.warned_at = 0.0
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """Drop message spam per user before it reaches the database or the teacher.
+
+    Each user gets a sliding-window limit per bucket: every command has its
+    own bucket, video notes share one and other messages share another.
+    Video notes whose `file_unique_id` the user already sent within
+    `dedupe_ttl` seconds are dropped as duplicates.  State is kept for at
+    most `max_users` recently active users (LRU).  A dropped message is
+    answered with a notice at most once per `warn_interval` seconds.
+    Register it as an outer `message` middleware so filters are not run.
+    """
+
+    DEFAULT_LIMITS = {
+        "video_note": (3, 60),
+        "/start": (3, 60),
+        "command": (5, 10),
+        "message": (15, 10),
+    }
+
+    def __init__(self, limits=None, max_users=10000, dedupe_size=8, dedupe_ttl=24 * 3600,
+                 warn_interval=10, metrics=None):
+        self.limits = {**self.DEFAULT_LIMITS, **(limits or {})}
+        self.max_users = max_users
+        self.dedupe_size = dedupe_size
+        self.dedupe_ttl = dedupe_ttl
+        self.warn_interval = warn_interval
+        self.metrics = metrics
+        self._users = OrderedDict()
+
+    def _window(self, user_id):
+        window = self._users.get(user_id)
+        if window is None:
+            window = self._users[user_id] = _UserWindow(self.dedupe_size)
+            if len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        return window
+
+    def _bucket(self, message):
+        if message.video_note:
+            return "video_note", self.limits["video_note"]
+        if message.text and message.text.startswith("/"):
+            command = message.text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+            return command, self.limits.get(command, self.limits["command"])
+        return "message", self.limits["message"]
+
+    def _is_duplicate(self, window, file_unique_id, now):
+        for seen_id, seen_at in window.seen:
+            if seen_id == file_unique_id and now - seen_at < self.dedupe_ttl:
+                return True
+        return False
+
+    def forget(self, user_id, file_unique_id):
+        """Let the user send this video note again, e.g. after it was rejected for a missing topic."""
+        window = self._users.get(user_id)
+        if window is not None:
+            kept = [item for item in window.seen if item[0] != file_unique_id]
+            window.seen.clear()
+            window.seen.extend(kept)
+
+    def clear(self):
+        self._users.clear()
+
+    async def _drop(self, message, window, now, reason, text):
+        if self.metrics:
+            self.metrics.throttled.inc(reason)
+        if now - window.warned_at >= self.warn_interval:
+            window.warned_at = now
+            await message.answer(text)
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        if user is None:
+            return await handler(event, data)
+
+        now = time.monotonic()
+        window = self._window(user.id)
+        bucket, (limit, period) = self._bucket(event)
+        # Duplicates are dropped before they count against the rate limit
+        file_unique_id = event.video_note.file_unique_id if event.video_note else None
+        if file_unique_id and self._is_duplicate(window, file_unique_id, now):
+            await self._drop(event, window, now, "duplicate", "⚠️ Bu video allaqachon yuborilgan.")
+            return None
+
+        hits = window.hits.get(bucket)
+        if hits is None:
+            hits = window.hits[bucket] = deque(maxlen=limit)
+        if len(hits) == limit and now - hits[0] < period:
+            await self._drop(
+                event, window, now, "rate",
+                "⏳ Juda ko'p xabar yubordingiz. Iltimos, biroz kutib qayta urinib ko'ring."
+            )
+            return None
+        hits.append(now)
+        if file_unique_id:
+            window.seen.append((file_unique_id, now))
+
+        return await handler(event, data)
+
+
+class LogContextMiddleware(BaseMiddleware):
+    """Outer `update` middleware tagging log records with the update and user id."""
+
+    async def __call__(self, handler, event, data):
+        user = data.get("event_from_user")
+        token = log_context.set((event.update_id, user.id if user else None))
+        try:
+            return await handler(event, data)
+        finally:
+            log_context.reset(token)
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Outer `update` middleware timing every update end to end."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data):
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            self.metrics.updates.observe(time.perf_counter() - started, event.event_type)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware timing the matched handler and counting its exceptions."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data):
+        name = data["handler"].callback.__name__
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.metrics.handler_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            self.metrics.handlers.observe(time.perf_counter() - started, name)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """Bot session middleware timing every Bot API request, direct or via the outbox."""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            self.metrics.api_errors.inc(name, type(e).__name__)
+            raise
+        finally:
+            self.metrics.api_requests.observe(time.perf_counter() - started, name)
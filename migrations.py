@@ -0,0 +1,239 @@
+"""Versioned schema migrations.
+
+The applied version lives in SQLite's `PRAGMA user_version`.  Each migration
+runs once, in order, inside its own transaction; add new steps to the end of
+MIGRATIONS and never edit one that has already shipped.
+"""
+import logging
+
+from config import DEFAULT_GROUPS
+from stats import create_daily_rollup
+
+
+async def _columns(db, table):
+    async with db.execute(f"PRAGMA table_info({table})") as cursor:
+        return {row[1] for row in await cursor.fetchall()}
+
+
+async def _add_hot_query_indexes(db):
+    # Covering indexes for the per-student, per-month and per-group queries
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_grades_user_grade ON grades (user_id, grade)"
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_grades_date_user_grade ON grades (date, user_id, grade)"
+    )
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_users_group_name ON users (group_name, full_name)"
+    )
+
+
+async def _grades_date_to_epoch(db):
+    # ISO-8601 strings with a UTC offset -> integer epoch seconds
+    await db.execute("""
+        UPDATE grades
+        SET date = CAST(strftime('%s', date) AS INTEGER)
+        WHERE typeof(date) = 'text'
+    """)
+
+
+async def _create_fsm_state(db):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS fsm_state (
+            key TEXT PRIMARY KEY,
+            state TEXT,
+            data TEXT,
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_fsm_state_updated_at ON fsm_state (updated_at)"
+    )
+
+
+async def _create_groups(db):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS groups (
+            name TEXT PRIMARY KEY,
+            archived INTEGER NOT NULL DEFAULT 0,
+            changed_at INTEGER NOT NULL
+        )
+    """)
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_groups_changed_at ON groups (changed_at)"
+    )
+    # Keep every group that already has students
+    cursor = await db.execute("""
+        INSERT OR IGNORE INTO groups (name, archived, changed_at)
+        SELECT DISTINCT group_name, 0, CAST(strftime('%s', 'now') AS INTEGER) * 1000
+        FROM users
+    """)
+    # A live database also keeps the hardcoded groups it was offering; a fresh
+    # install has no students and is seeded by GroupRegistry.load() instead
+    if cursor.rowcount > 0:
+        await db.executemany("""
+            INSERT OR IGNORE INTO groups (name, archived, changed_at)
+            VALUES (?, 0, CAST(strftime('%s', 'now') AS INTEGER) * 1000)
+        """, [(name,) for name in DEFAULT_GROUPS])
+
+
+async def _create_jobs(db):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_at REAL NOT NULL,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL
+        )
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_run_at ON jobs (run_at)")
+
+
+async def _create_teachers(db):
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS teachers (
+            user_id INTEGER PRIMARY KEY,
+            name TEXT,
+            active INTEGER NOT NULL DEFAULT 1,
+            changed_at INTEGER NOT NULL
+        )
+    """)
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_teachers_changed_at ON teachers (changed_at)"
+    )
+    # NULL means "not assigned": routed to the head teacher (TEACHER_ID)
+    await db.execute("ALTER TABLE groups ADD COLUMN teacher_id INTEGER")
+    # Fresh installs already create submissions with teacher_id (App.init_db)
+    if "teacher_id" not in await _columns(db, "submissions"):
+        await db.execute("ALTER TABLE submissions ADD COLUMN teacher_id INTEGER")
+    await db.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_teacher ON submissions (teacher_id, created_at)"
+    )
+
+
+async def _add_job_leases(db):
+    # A worker claims due jobs by setting claimed_until; expired claims are retried
+    await db.execute("ALTER TABLE jobs ADD COLUMN claimed_until REAL")
+
+
+async def _add_digests(db):
+    # Which digests go to the group's teacher ('both', 'weekly', 'monthly' or
+    # 'off') and at which Tashkent hour; NULL means DIGEST_SEND_HOUR
+    await db.execute("ALTER TABLE groups ADD COLUMN digest TEXT NOT NULL DEFAULT 'both'")
+    await db.execute("ALTER TABLE groups ADD COLUMN digest_hour INTEGER")
+    # Rendered digests of completed periods; `period` is the week's Monday or "YYYY-MM"
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS digests (
+            kind TEXT NOT NULL,
+            period TEXT NOT NULL,
+            group_name TEXT NOT NULL,
+            text TEXT NOT NULL,
+            built_at INTEGER NOT NULL,
+            sent_at INTEGER,
+            PRIMARY KEY (kind, period, group_name)
+        )
+    """)
+
+
+async def _add_topic_deadlines(db):
+    # When the current topic was entered and whether its reminder went out
+    await db.execute("ALTER TABLE users ADD COLUMN topic_set_at INTEGER")
+    await db.execute("ALTER TABLE users ADD COLUMN topic_reminded_at INTEGER")
+    # Topics entered before this migration start their window now
+    await db.execute("""
+        UPDATE users SET topic_set_at = CAST(strftime('%s', 'now') AS INTEGER)
+        WHERE current_topic IS NOT NULL
+    """)
+    # Only open topics are indexed; the sweep's queries repeat this condition
+    await db.execute("""
+        CREATE INDEX IF NOT EXISTS idx_users_topic_set_at ON users (topic_set_at)
+        WHERE current_topic IS NOT NULL
+    """)
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_submissions_user ON submissions (user_id)")
+
+
+async def _key_submissions_by_chat(db):
+    # Message ids are only unique within a chat: key on (chat_id, message_id).
+    # Videos come from private chats, so existing rows' chat is the student's.
+    # Fresh installs already create the keyed table (App.init_db).
+    if "chat_id" in await _columns(db, "submissions"):
+        return
+    await db.execute("""
+        CREATE TABLE submissions_new (
+            chat_id INTEGER NOT NULL,
+            message_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            topic TEXT NOT NULL,
+            forwarded_msg_id INTEGER NOT NULL,
+            info_msg_id INTEGER NOT NULL,
+            created_at INTEGER NOT NULL,
+            teacher_id INTEGER,
+            PRIMARY KEY (chat_id, message_id)
+        )
+    """)
+    await db.execute("""
+        INSERT INTO submissions_new
+            (chat_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, created_at, teacher_id)
+        SELECT user_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, created_at, teacher_id
+        FROM submissions
+    """)
+    await db.execute("DROP TABLE submissions")
+    await db.execute("ALTER TABLE submissions_new RENAME TO submissions")
+    await db.execute("CREATE INDEX idx_submissions_created_at ON submissions (created_at)")
+    await db.execute("CREATE INDEX idx_submissions_teacher ON submissions (teacher_id, created_at)")
+    await db.execute("CREATE INDEX idx_submissions_user ON submissions (user_id)")
+
+
+async def _add_registered_at(db):
+    # Students registered before this migration count as always registered
+    await db.execute("ALTER TABLE users ADD COLUMN registered_at INTEGER")
+
+
+MIGRATIONS = [
+    (1, "add hot query indexes", _add_hot_query_indexes),
+    (2, "store grades.date as epoch seconds", _grades_date_to_epoch),
+    (3, "create fsm_state table", _create_fsm_state),
+    (4, "create groups table", _create_groups),
+    (5, "create jobs table", _create_jobs),
+    (6, "create teachers table and group/submission teacher_id", _create_teachers),
+    (7, "add job leases", _add_job_leases),
+    (8, "add group digest settings and digests table", _add_digests),
+    (9, "add topic deadlines", _add_topic_deadlines),
+    # After migration 2: the rollup's day is computed from epoch grades.date
+    (10, "create daily_rollup", create_daily_rollup),
+    (11, "key submissions on (chat_id, message_id)", _key_submissions_by_chat),
+    (12, "add users.registered_at", _add_registered_at),
+]
+
+
+async def get_schema_version(db):
+    async with db.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+
+async def run_migrations(db):
+    """Apply every migration newer than the database's user_version.
+
+    Safe to run from several processes at once: each step takes the write
+    lock first and re-reads the version, so only one process applies it.
+    """
+    current = await get_schema_version(db)
+    for version, name, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        await db.commit()
+        try:
+            await db.execute("BEGIN IMMEDIATE")
+            current = await get_schema_version(db)
+            if version <= current:
+                await db.rollback()
+                continue
+            logging.info("Applying migration %d: %s", version, name)
+            await migrate(db)
+            await db.execute(f"PRAGMA user_version = {version}")
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+        current = version
+    return current
@@ -0,0 +1,197 @@
+"""Outbound Bot API queue with Telegram rate limits.
+
+Handlers enqueue aiogram method objects (SendMessage, ForwardMessage, ...)
+and return; a fixed pool of workers sends them.  Jobs for one chat are sent
+strictly in order, at most one at a time, and pace themselves through a
+per-chat token bucket plus one global bucket.  429 RetryAfter pauses both,
+network and server errors are retried with exponential backoff, and any
+other API error is reported to the job's `on_error` callback.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        return self.tokens
+
+    def delay(self):
+        """Take a token, returning how long to wait before it may be used."""
+        self.refill()
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def pause(self, seconds):
+        """Empty the bucket so nothing is sent for `seconds` (used on 429)."""
+        # The retried request takes one token itself, hence the +1
+        self.tokens = min(self.tokens, 0) - seconds * self.rate + 1
+        self.updated_at = time.monotonic()
+
+
+class OutboxJob:
+    __slots__ = ("method", "chat_id", "on_success", "on_error", "attempts")
+
+    def __init__(self, method, chat_id, on_success, on_error):
+        self.method = method
+        self.chat_id = chat_id
+        self.on_success = on_success
+        self.on_error = on_error
+        self.attempts = 0
+
+
+class Outbox:
+    def __init__(self, bot, workers=8, global_rate=25, per_chat_rate=1,
+                 per_chat_burst=3, max_retries=5, base_backoff=0.5, max_backoff=30,
+                 max_buckets=10000):
+        self.bot = bot
+        self.workers = workers
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_buckets = max_buckets
+
+        self._chats = {}
+        self._buckets = {}
+        self._ready = asyncio.Queue()
+        self._tasks = []
+        self._depth = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.counters = {"sent": 0, "retried": 0, "rate_limited": 0, "failed": 0}
+
+    @property
+    def depth(self):
+        """Jobs enqueued but not finished yet (including the ones being sent)."""
+        return self._depth
+
+    def stats(self):
+        return {
+            "depth": self._depth,
+            "chats": len(self._chats),
+            **self.counters,
+        }
+
+    def enqueue(self, method, on_success=None, on_error=None):
+        """Queue an aiogram method; callbacks are coroutines taking the result/exception."""
+        chat_id = getattr(method, "chat_id", None)
+        job = OutboxJob(method, chat_id, on_success, on_error)
+        self._depth += 1
+        self._idle.clear()
+
+        pending = self._chats.get(chat_id)
+        if pending is None:
+            self._chats[chat_id] = deque([job])
+            self._ready.put_nowait(chat_id)
+        else:
+            pending.append(job)
+        return job
+
+    def _bucket(self, chat_id):
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                # A full bucket with nothing queued is the same as a new one
+                for idle_chat in [
+                    c for c, b in self._buckets.items()
+                    if c not in self._chats and b.refill() >= b.capacity
+                ]:
+                    del self._buckets[idle_chat]
+            bucket = self._buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst)
+        return bucket
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._ready.get()
+            pending = self._chats[chat_id]
+            job = pending[0]
+            try:
+                done = await self._send(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error("Outbox callback failed for %s: %s", type(job.method).__name__, e, exc_info=True)
+                done = True
+
+            if done:
+                pending.popleft()
+                self._depth -= 1
+                if not self._depth:
+                    self._idle.set()
+            if pending:
+                self._ready.put_nowait(chat_id)
+            else:
+                del self._chats[chat_id]
+
+    async def _send(self, job):
+        """Send one job; True when it is finished (sent or given up), False to retry."""
+        delay = max(self._bucket(job.chat_id).delay(), self.global_bucket.delay())
+        if delay:
+            await asyncio.sleep(delay)
+
+        job.attempts += 1
+        try:
+            result = await self.bot(job.method)
+        except TelegramRetryAfter as e:
+            self.counters["rate_limited"] += 1
+            logging.warning("Flood limit for chat %s, retrying in %ss", job.chat_id, e.retry_after)
+            # A flood wait is not only about this chat: hold every send
+            self._bucket(job.chat_id).pause(e.retry_after)
+            self.global_bucket.pause(e.retry_after)
+            if job.attempts > self.max_retries:
+                return await self._fail(job, e)
+            return False
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if job.attempts > self.max_retries:
+                return await self._fail(job, e)
+            self.counters["retried"] += 1
+            await asyncio.sleep(min(self.max_backoff, self.base_backoff * 2 ** (job.attempts - 1)))
+            return False
+        except Exception as e:
+            return await self._fail(job, e)
+
+        self.counters["sent"] += 1
+        if job.on_success:
+            await job.on_success(result)
+        return True
+
+    async def _fail(self, job, error):
+        self.counters["failed"] += 1
+        logging.error("Outbox gave up on %s to %s: %s", type(job.method).__name__, job.chat_id, error)
+        if job.on_error:
+            await job.on_error(error)
+        return True
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout=10):
+        """Give queued jobs up to `timeout` seconds to go out, then stop the workers."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Outbox stopped with %d unsent jobs", self._depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,88 @@
+import time
+from collections import OrderedDict
+
+
+class UserProfile:
+    __slots__ = ("user_id", "full_name", "username", "group_name", "current_topic")
+
+    def __init__(self, user_id, full_name, username, group_name, current_topic):
+        self.user_id = user_id
+        self.full_name = full_name
+        self.username = username
+        self.group_name = group_name
+        self.current_topic = current_topic
+
+
+class ProfileCache:
+    """Write-through LRU cache of rows from the `users` table.
+
+    Registration and topic changes go through `register` and `set_topic`,
+    which write the row and the cache together; grading clears topics in its
+    own transaction and reports it with `topics_cleared`.  Users who are not
+    registered are cached too (as None), so repeated /start from a stranger
+    costs one query.  Entries are reloaded after `ttl` seconds, which bounds
+    how stale a profile changed by another worker process can get.
+    """
+
+    def __init__(self, database, max_entries=10000, ttl=300):
+        self.database = database
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # user_id -> (UserProfile or None, cached_at)
+        self._entries = OrderedDict()
+
+    def _remember(self, user_id, profile):
+        self._entries[user_id] = (profile, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, user_id, refresh=False):
+        """The user's profile, or None if they have not registered.
+
+        `refresh` reads the row even if it is cached, for callers that must
+        see changes made by another worker process.
+        """
+        entry = self._entries.get(user_id)
+        if not refresh and entry is not None and time.monotonic() - entry[1] <= self.ttl:
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+        row = await self.database.fetchone("""
+            SELECT user_id, full_name, username, group_name, current_topic
+            FROM users
+            WHERE user_id = ?
+        """, (user_id,))
+        profile = UserProfile(*row) if row else None
+        self._remember(user_id, profile)
+        return profile
+
+    async def register(self, user_id, full_name, username, group_name):
+        await self.database.execute("""
+            INSERT INTO users (user_id, full_name, username, group_name, current_topic, registered_at)
+            VALUES (?, ?, ?, ?, NULL, ?)
+        """, (user_id, full_name, username, group_name, int(time.time())))
+        self._remember(user_id, UserProfile(user_id, full_name, username, group_name, None))
+
+    async def set_topic(self, user_id, topic):
+        # A new topic starts a new reminder/expiry window
+        await self.database.execute("""
+            UPDATE users SET current_topic = ?, topic_set_at = ?, topic_reminded_at = NULL
+            WHERE user_id = ?
+        """, (topic, int(time.time()), user_id))
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] is not None:
+            entry[0].current_topic = topic
+        else:
+            self._entries.pop(user_id, None)
+
+    def topics_cleared(self, user_ids):
+        """Record that `user_ids` had current_topic set to NULL (already committed)."""
+        for user_id in user_ids:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] is not None:
+                entry[0].current_topic = None
+
+    def clear(self):
+        """Drop everything, e.g. after a group rename moved students in bulk."""
+        self._entries.clear()
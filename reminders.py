@@ -0,0 +1,154 @@
+"""Reminders and expiry for topics that never got a video.
+
+A student who enters a topic in /start and then sends nothing keeps
+`users.current_topic` set.  Instead of one timer per student, a recurring
+`topic_sweep` job scans the open topics through the partial index on
+`topic_set_at`:
+
+- topics older than `expire_after` are cleared, and the student is told to
+  enter a new one;
+- topics older than `remind_after` get one reminder.
+
+Topics whose video is waiting for a grade (a row in `submissions`) are left
+alone.  Each step claims at most `batch_size` students with one
+UPDATE ... RETURNING, so several workers never message the same student.
+The messages go through the outbox.  A full batch brings the next sweep
+forward to `batch_interval` seconds, so a backlog drains in steps instead
+of flooding the outbox ahead of interactive replies.  Sweeps only run
+between `active_hours` (Tashkent time) so nobody is woken up at night.
+"""
+import logging
+import time
+from datetime import datetime
+
+from aiogram.methods import SendMessage
+
+import clock
+from renderer import clip
+
+MAX_TOPIC_LENGTH = 100
+
+# Open topics without a pending submission; `users` is the outer table
+_STALE = """
+    current_topic IS NOT NULL AND topic_set_at < ?
+    AND NOT EXISTS (SELECT 1 FROM submissions s WHERE s.user_id = users.user_id)
+"""
+
+# Parameters: (set before, batch size)
+EXPIRE_TOPICS = f"""
+    UPDATE users SET current_topic = NULL
+    WHERE user_id IN (
+        SELECT user_id FROM users
+        WHERE {_STALE}
+        ORDER BY topic_set_at
+        LIMIT ?
+    )
+    RETURNING user_id
+"""
+
+# Parameters: (reminded at, set before, set since, batch size); topics
+# already past expiry are left to EXPIRE_TOPICS rather than reminded
+REMIND_TOPICS = f"""
+    UPDATE users SET topic_reminded_at = ?
+    WHERE user_id IN (
+        SELECT user_id FROM users
+        WHERE {_STALE} AND topic_set_at >= ? AND topic_reminded_at IS NULL
+        ORDER BY topic_set_at
+        LIMIT ?
+    )
+    RETURNING user_id, current_topic, topic_set_at
+"""
+
+
+class TopicReminders:
+    def __init__(self, database, outbox, profiles, scheduler, remind_after, expire_after,
+                 batch_size=200, interval=900, batch_interval=60, active_hours=(9, 21)):
+        self.database = database
+        self.outbox = outbox
+        self.profiles = profiles
+        self.scheduler = scheduler
+        # Seconds; 0 disables that step
+        self.remind_after = remind_after
+        self.expire_after = expire_after
+        self.batch_size = batch_size
+        self.interval = interval
+        self.batch_interval = batch_interval
+        self.active_hours = active_hours
+
+    @property
+    def enabled(self):
+        return bool(self.remind_after or self.expire_after)
+
+    def _next_sweep(self, delay):
+        """`delay`, pushed to the start of the active hours if it falls outside them."""
+        period = clock.current_period()
+        run_at = time.time() + delay
+        start, end = (period.day_start + hour * 3600 for hour in self.active_hours)
+        if run_at < start:
+            run_at = start
+        elif run_at >= end:
+            run_at = period.day_end + self.active_hours[0] * 3600
+        return run_at - time.time()
+
+    async def ensure_scheduled(self):
+        if self.enabled:
+            await self.scheduler.schedule_once("topic_sweep", {}, delay=self._next_sweep(0))
+
+    async def expire(self):
+        """Clear one batch of expired topics; returns how many were cleared."""
+        now = int(time.time())
+        async with self.database.acquire() as db:
+            async with db.execute(EXPIRE_TOPICS, (now - self.expire_after, self.batch_size)) as cursor:
+                user_ids = [row[0] for row in await cursor.fetchall()]
+            await db.commit()
+
+        self.profiles.topics_cleared(user_ids)
+        for user_id in user_ids:
+            self.outbox.enqueue(SendMessage(
+                chat_id=user_id,
+                text=(
+                    "⌛️ Retelling mavzusining muddati tugadi, chunki video yuborilmadi.\n"
+                    "Yangi mavzu kiritish uchun /start buyrug'ini yuboring."
+                )
+            ))
+        return len(user_ids)
+
+    async def remind(self):
+        """Send one batch of reminders; returns how many were sent."""
+        now = int(time.time())
+        expired_before = now - self.expire_after if self.expire_after else 0
+        async with self.database.acquire() as db:
+            async with db.execute(
+                REMIND_TOPICS, (now, now - self.remind_after, expired_before, self.batch_size)
+            ) as cursor:
+                rows = await cursor.fetchall()
+            await db.commit()
+
+        for user_id, topic, topic_set_at in rows:
+            text = (
+                f"⏰ Eslatma: \"{clip(topic, MAX_TOPIC_LENGTH)}\" mavzusi bo'yicha "
+                "video retelling hali yuborilmadi.\n"
+                "Iltimos, video xabar yuboring."
+            )
+            if self.expire_after:
+                deadline = datetime.fromtimestamp(topic_set_at + self.expire_after, clock.TASHKENT)
+                text += f"\n⌛️ Mavzu {deadline.strftime('%d.%m %H:%M')} da bekor qilinadi."
+            self.outbox.enqueue(SendMessage(chat_id=user_id, text=text))
+        return len(rows)
+
+    async def sweep(self, payload=None):
+        """The `topic_sweep` job: one batch of expiries and reminders, then reschedule."""
+        if not self.enabled:
+            # Both were turned off since the job was queued: let it lapse
+            return
+        full = False
+        try:
+            expired = await self.expire() if self.expire_after else 0
+            reminded = await self.remind() if self.remind_after else 0
+            full = self.batch_size in (expired, reminded)
+            if expired or reminded:
+                logging.info("Topic sweep: %d expired, %d reminded", expired, reminded)
+        finally:
+            await self.scheduler.reschedule(
+                "topic_sweep", {}, delay=self._next_sweep(self.batch_interval if full else self.interval)
+            )
@@ -0,0 +1,146 @@
+"""Stream long reports to Telegram page by page.
+
+Rows are read in small keyset-paginated chunks, formatted into blocks (one
+per student or group), and packed into pages that never split a block.
+Each page is queued on the outbox as soon as it is full, so the first
+message goes out before the rest of the result set has been read.  A
+connection is held only while a chunk is read, never while a page is sent.
+"""
+from aiogram.methods import EditMessageText, SendMessage
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def telegram_length(text):
+    # Telegram counts UTF-16 code units, so most emoji count as two
+    return len(text.encode("utf-16-le")) // 2
+
+
+def clip(text, limit):
+    """`text` cut to `limit` characters, with an ellipsis if it was longer."""
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def format_change(current, previous):
+    """"+12%" for current vs previous, "—" when there is nothing to compare with."""
+    if not previous:
+        return "—"
+    change = (current - previous) * 100 / previous
+    return f"{change:+.0f}%"
+
+
+async def fetch_rows(cursor, batch_size=100):
+    while True:
+        rows = await cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            yield row
+
+
+async def keyset_rows(database, build_query, sort_key, chunk_size=50):
+    """Rows of a keyset-paginated query, read `chunk_size` at a time.
+
+    `build_query(after, limit)` returns (sql, params) for the rows following
+    the sort key `after` (None for the first chunk), and `sort_key(row)` is
+    the key of a row.  The connection goes back to the pool after every
+    chunk, before the caller sees its rows.
+    """
+    after = None
+    while True:
+        rows = await database.fetchall(*build_query(after, chunk_size))
+        for row in rows:
+            yield row
+        if len(rows) < chunk_size:
+            return
+        after = sort_key(rows[-1])
+
+
+def _split_line(line, limit):
+    if telegram_length(line) <= limit:
+        return [line]
+    parts = []
+    current = []
+    size = 0
+    for char in line:
+        char_size = 2 if ord(char) > 0xFFFF else 1
+        if size + char_size > limit:
+            parts.append("".join(current))
+            current, size = [], 0
+        current.append(char)
+        size += char_size
+    if current:
+        parts.append("".join(current))
+    return parts
+
+
+def _split_block(block, limit):
+    """Split a block that cannot fit on one page, preferring line boundaries."""
+    pieces = []
+    current = []
+    size = 0
+    for line in block.splitlines(keepends=True):
+        for part in _split_line(line, limit):
+            length = telegram_length(part)
+            if current and size + length > limit:
+                pieces.append("".join(current))
+                current, size = [], 0
+            current.append(part)
+            size += length
+    if current:
+        pieces.append("".join(current))
+    return pieces
+
+
+async def send_pages(send, blocks, header="", limit=TELEGRAM_MESSAGE_LIMIT):
+    """Pack `blocks` (an async iterable of str) into pages and `send` each one.
+
+    Returns the number of pages sent; nothing at all is sent when `blocks`
+    is empty, so the caller can answer with its own "no data" message.
+    """
+    page = []
+    size = 0
+    pages = 0
+    started = False
+
+    async for block in blocks:
+        if not started:
+            started = True
+            if header:
+                page.append(header)
+                size = telegram_length(header)
+
+        length = telegram_length(block)
+        pieces = [block] if length <= limit else _split_block(block, limit)
+        for piece in pieces:
+            length = telegram_length(piece)
+            if page and size + length > limit:
+                await send("".join(page))
+                pages += 1
+                page, size = [], 0
+            page.append(piece)
+            size += length
+
+    if page:
+        await send("".join(page))
+        pages += 1
+    return pages
+
+
+def page_sender(outbox, message, edit_first=False):
+    """`send` callable for send_pages queueing replies to `message` on `outbox`.
+
+    With `edit_first` the first page replaces the text of `message` itself
+    (e.g. the menu the teacher clicked) and later pages follow as replies.
+    The outbox keeps one chat's messages in order.
+    """
+    state = {"edit": edit_first}
+
+    async def send(text):
+        if state["edit"]:
+            state["edit"] = False
+            outbox.enqueue(EditMessageText(chat_id=message.chat.id, message_id=message.message_id, text=text))
+        else:
+            outbox.enqueue(SendMessage(chat_id=message.chat.id, text=text))
+
+    return send
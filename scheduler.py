@@ -0,0 +1,179 @@
+"""Persistent delayed jobs.
+
+Jobs live in the `jobs` table so they survive restarts; an in-memory heap
+ordered by run time decides when the loop wakes up.  Every wake-up claims
+the due jobs with one UPDATE ... RETURNING, runs them as a batch and deletes
+them with a single statement.
+
+Several worker processes can share the table: a claim is a lease
+(`claimed_until`), so each job runs in one worker, and a job whose worker
+died is picked up by another one after the lease expires.  Workers also
+poll every `poll_interval` seconds for jobs scheduled by someone else.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import time
+
+
+class Scheduler:
+    def __init__(self, database, batch_size=100, lease=60, poll_interval=30):
+        self.database = database
+        self.batch_size = batch_size
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._handlers = {}
+        self._heap = []
+        self._wakeup = asyncio.Event()
+        self._task = None
+        # Breaks run_at ties in the heap
+        self._sequence = itertools.count()
+
+    @property
+    def pending(self):
+        """Jobs this process is waiting to wake up for."""
+        return len(self._heap)
+
+    def register(self, kind, handler):
+        """`handler(payload)` is a coroutine run when a job of `kind` is due."""
+        self._handlers[kind] = handler
+
+    async def schedule(self, kind, payload, delay=0):
+        run_at = time.time() + delay
+        async with self.database.acquire() as db:
+            cursor = await db.execute(
+                "INSERT INTO jobs (run_at, kind, payload) VALUES (?, ?, ?)",
+                (run_at, kind, json.dumps(payload))
+            )
+            job_id = cursor.lastrowid
+            await db.commit()
+        self._push(run_at, job_id)
+        return job_id
+
+    async def schedule_once(self, kind, payload, delay=0):
+        """Like schedule(), unless a job of `kind` is already waiting; None then.
+
+        For recurring jobs that reschedule themselves: every worker can call it
+        at startup and the table still ends up with a single job.
+        """
+        run_at = time.time() + delay
+        async with self.database.acquire() as db:
+            cursor = await db.execute("""
+                INSERT INTO jobs (run_at, kind, payload)
+                SELECT ?, ?, ?
+                WHERE NOT EXISTS (SELECT 1 FROM jobs WHERE kind = ?)
+            """, (run_at, kind, json.dumps(payload), kind))
+            job_id = cursor.lastrowid if cursor.rowcount else None
+            await db.commit()
+        if job_id is not None:
+            self._push(run_at, job_id)
+        return job_id
+
+    async def reschedule(self, kind, payload, delay=0):
+        """Replace every job of `kind`, the running one included, with one new job.
+
+        For recurring jobs scheduling their next run: the delete and the insert
+        share a transaction, so a crash before the running job is deleted
+        cannot leave two chains behind, and duplicates from earlier are dropped.
+        """
+        run_at = time.time() + delay
+        async with self.database.acquire() as db:
+            await db.execute("BEGIN IMMEDIATE")
+            await db.execute("DELETE FROM jobs WHERE kind = ?", (kind,))
+            cursor = await db.execute(
+                "INSERT INTO jobs (run_at, kind, payload) VALUES (?, ?, ?)",
+                (run_at, kind, json.dumps(payload))
+            )
+            job_id = cursor.lastrowid
+            await db.commit()
+        self._push(run_at, job_id)
+        return job_id
+
+    def _push(self, run_at, job_id):
+        # The heap only says when to wake up; the jobs table says what to run
+        heapq.heappush(self._heap, (run_at, next(self._sequence), job_id))
+        if self._heap[0][2] == job_id:
+            # New earliest job: let the loop recompute its sleep
+            self._wakeup.set()
+
+    async def recover(self):
+        rows = await self.database.fetchall("SELECT id, run_at FROM jobs")
+        for job_id, run_at in rows:
+            self._push(run_at, job_id)
+        logging.info("Recovered %d scheduled jobs", len(rows))
+        return len(rows)
+
+    async def _claim_due(self, now):
+        async with self.database.acquire() as db:
+            async with db.execute("""
+                UPDATE jobs SET claimed_until = ?
+                WHERE id IN (
+                    SELECT id FROM jobs
+                    WHERE run_at <= ? AND (claimed_until IS NULL OR claimed_until < ?)
+                    ORDER BY run_at
+                    LIMIT ?
+                )
+                RETURNING id, run_at, kind, payload
+            """, (now + self.lease, now, now, self.batch_size)) as cursor:
+                claimed = await cursor.fetchall()
+            await db.commit()
+        return sorted(claimed, key=lambda row: row[1])
+
+    async def _run_due(self):
+        """Run one batch of due jobs; True if more may be waiting."""
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            heapq.heappop(self._heap)
+
+        batch = await self._claim_due(now)
+        for job_id, _, kind, payload in batch:
+            handler = self._handlers.get(kind)
+            if handler is None:
+                logging.error("No handler registered for scheduled job %s (%s)", job_id, kind)
+                continue
+            try:
+                await handler(json.loads(payload))
+            except Exception as e:
+                logging.error("Scheduled job %s (%s) failed: %s", job_id, kind, e, exc_info=True)
+
+        if batch:
+            ids = [job_id for job_id, _, _, _ in batch]
+            await self.database.execute(
+                f"DELETE FROM jobs WHERE id IN ({','.join('?' * len(ids))})", ids
+            )
+        return len(batch) == self.batch_size
+
+    async def _loop(self):
+        next_poll = time.monotonic()
+        while True:
+            self._wakeup.clear()
+            timeout = next_poll - time.monotonic()
+            if self._heap:
+                timeout = min(timeout, self._heap[0][0] - time.time())
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                if not await self._run_due():
+                    next_poll = time.monotonic() + self.poll_interval
+            except Exception as e:
+                logging.error("Scheduler batch failed: %s", e, exc_info=True)
+                await asyncio.sleep(1)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,467 @@
+"""Grade aggregates maintained by triggers.
+
+`student_stats` holds one row per student and `group_stats` one row per
+group.  Triggers on `grades` and `users` keep both in step with every write,
+inside the same transaction as the write itself, so the statistics handlers
+read a single row instead of re-aggregating `grades`.
+
+`daily_rollup` holds one row per student, Tashkent calendar day and topic,
+so date-range and per-topic reports touch O(days) rows instead of every
+grade in the range.
+"""
+
+# Tashkent has been UTC+5 without DST since 1992
+TASHKENT_OFFSET = "+5 hours"
+
+STATS_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS student_stats (
+        user_id INTEGER PRIMARY KEY,
+        total INTEGER NOT NULL DEFAULT 0,
+        grade_sum INTEGER NOT NULL DEFAULT 0,
+        grade_5 INTEGER NOT NULL DEFAULT 0,
+        grade_4 INTEGER NOT NULL DEFAULT 0,
+        grade_3 INTEGER NOT NULL DEFAULT 0,
+        grade_2 INTEGER NOT NULL DEFAULT 0,
+        grade_1 INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS group_stats (
+        group_name TEXT PRIMARY KEY,
+        students INTEGER NOT NULL DEFAULT 0,
+        ungraded_students INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        grade_sum INTEGER NOT NULL DEFAULT 0,
+        grade_5 INTEGER NOT NULL DEFAULT 0,
+        grade_4 INTEGER NOT NULL DEFAULT 0,
+        grade_3 INTEGER NOT NULL DEFAULT 0,
+        grade_2 INTEGER NOT NULL DEFAULT 0,
+        grade_1 INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+ROLLUP_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS daily_rollup (
+        user_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        topic TEXT NOT NULL,
+        group_name TEXT,
+        total INTEGER NOT NULL DEFAULT 0,
+        grade_sum INTEGER NOT NULL DEFAULT 0,
+        grade_5 INTEGER NOT NULL DEFAULT 0,
+        grade_4 INTEGER NOT NULL DEFAULT 0,
+        grade_3 INTEGER NOT NULL DEFAULT 0,
+        grade_2 INTEGER NOT NULL DEFAULT 0,
+        grade_1 INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, day, topic)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_daily_rollup_day_group ON daily_rollup (day, group_name)",
+]
+
+# Adds (sign = "+") or removes (sign = "-") one student's totals to/from a group
+_MOVE_STUDENT = """
+    UPDATE group_stats SET
+        students = group_stats.students {sign} 1,
+        ungraded_students = group_stats.ungraded_students {sign} (s.total = 0),
+        total = group_stats.total {sign} s.total,
+        grade_sum = group_stats.grade_sum {sign} s.grade_sum,
+        grade_5 = group_stats.grade_5 {sign} s.grade_5,
+        grade_4 = group_stats.grade_4 {sign} s.grade_4,
+        grade_3 = group_stats.grade_3 {sign} s.grade_3,
+        grade_2 = group_stats.grade_2 {sign} s.grade_2,
+        grade_1 = group_stats.grade_1 {sign} s.grade_1
+    FROM student_stats s
+    WHERE s.user_id = {row}.user_id AND group_stats.group_name = {row}.group_name;
+"""
+
+STATS_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_insert_stats AFTER INSERT ON users
+    BEGIN
+        INSERT OR IGNORE INTO student_stats (user_id) VALUES (NEW.user_id);
+        INSERT OR IGNORE INTO group_stats (group_name) VALUES (NEW.group_name);
+        {_MOVE_STUDENT.format(sign="+", row="NEW")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_group_stats AFTER UPDATE OF group_name ON users
+    WHEN OLD.group_name IS NOT NEW.group_name
+    BEGIN
+        {_MOVE_STUDENT.format(sign="-", row="OLD")}
+        INSERT OR IGNORE INTO group_stats (group_name) VALUES (NEW.group_name);
+        {_MOVE_STUDENT.format(sign="+", row="NEW")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_users_delete_stats AFTER DELETE ON users
+    BEGIN
+        {_MOVE_STUDENT.format(sign="-", row="OLD")}
+        DELETE FROM student_stats WHERE user_id = OLD.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_grades_insert_stats AFTER INSERT ON grades
+    BEGIN
+        UPDATE student_stats SET
+            total = total + 1,
+            grade_sum = grade_sum + NEW.grade,
+            grade_5 = grade_5 + (NEW.grade = 5),
+            grade_4 = grade_4 + (NEW.grade = 4),
+            grade_3 = grade_3 + (NEW.grade = 3),
+            grade_2 = grade_2 + (NEW.grade = 2),
+            grade_1 = grade_1 + (NEW.grade = 1)
+        WHERE user_id = NEW.user_id;
+
+        UPDATE group_stats SET
+            ungraded_students = ungraded_students - IFNULL(
+                (SELECT total = 1 FROM student_stats WHERE user_id = NEW.user_id), 0
+            ),
+            total = total + 1,
+            grade_sum = grade_sum + NEW.grade,
+            grade_5 = grade_5 + (NEW.grade = 5),
+            grade_4 = grade_4 + (NEW.grade = 4),
+            grade_3 = grade_3 + (NEW.grade = 3),
+            grade_2 = grade_2 + (NEW.grade = 2),
+            grade_1 = grade_1 + (NEW.grade = 1)
+        WHERE group_name = (SELECT group_name FROM users WHERE user_id = NEW.user_id);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_grades_delete_stats AFTER DELETE ON grades
+    BEGIN
+        UPDATE student_stats SET
+            total = total - 1,
+            grade_sum = grade_sum - OLD.grade,
+            grade_5 = grade_5 - (OLD.grade = 5),
+            grade_4 = grade_4 - (OLD.grade = 4),
+            grade_3 = grade_3 - (OLD.grade = 3),
+            grade_2 = grade_2 - (OLD.grade = 2),
+            grade_1 = grade_1 - (OLD.grade = 1)
+        WHERE user_id = OLD.user_id;
+
+        UPDATE group_stats SET
+            ungraded_students = ungraded_students + IFNULL(
+                (SELECT total = 0 FROM student_stats WHERE user_id = OLD.user_id), 0
+            ),
+            total = total - 1,
+            grade_sum = grade_sum - OLD.grade,
+            grade_5 = grade_5 - (OLD.grade = 5),
+            grade_4 = grade_4 - (OLD.grade = 4),
+            grade_3 = grade_3 - (OLD.grade = 3),
+            grade_2 = grade_2 - (OLD.grade = 2),
+            grade_1 = grade_1 - (OLD.grade = 1)
+        WHERE group_name = (SELECT group_name FROM users WHERE user_id = OLD.user_id);
+    END
+    """,
+]
+
+ROLLUP_TRIGGERS = [
+    # A student's history moves with them, as it does in group_stats
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_group_rollup AFTER UPDATE OF group_name ON users
+    WHEN OLD.group_name IS NOT NEW.group_name
+    BEGIN
+        UPDATE daily_rollup SET group_name = NEW.group_name WHERE user_id = NEW.user_id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS trg_users_delete_rollup AFTER DELETE ON users
+    BEGIN
+        DELETE FROM daily_rollup WHERE user_id = OLD.user_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_grades_insert_rollup AFTER INSERT ON grades
+    BEGIN
+        INSERT INTO daily_rollup
+            (user_id, day, topic, group_name, total, grade_sum,
+             grade_5, grade_4, grade_3, grade_2, grade_1)
+        VALUES (
+            NEW.user_id,
+            date(NEW.date, 'unixepoch', '{TASHKENT_OFFSET}'),
+            NEW.topic,
+            (SELECT group_name FROM users WHERE user_id = NEW.user_id),
+            1, NEW.grade,
+            NEW.grade = 5, NEW.grade = 4, NEW.grade = 3, NEW.grade = 2, NEW.grade = 1
+        )
+        ON CONFLICT (user_id, day, topic) DO UPDATE SET
+            total = total + 1,
+            grade_sum = grade_sum + excluded.grade_sum,
+            grade_5 = grade_5 + excluded.grade_5,
+            grade_4 = grade_4 + excluded.grade_4,
+            grade_3 = grade_3 + excluded.grade_3,
+            grade_2 = grade_2 + excluded.grade_2,
+            grade_1 = grade_1 + excluded.grade_1;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS trg_grades_delete_rollup AFTER DELETE ON grades
+    BEGIN
+        UPDATE daily_rollup SET
+            total = total - 1,
+            grade_sum = grade_sum - OLD.grade,
+            grade_5 = grade_5 - (OLD.grade = 5),
+            grade_4 = grade_4 - (OLD.grade = 4),
+            grade_3 = grade_3 - (OLD.grade = 3),
+            grade_2 = grade_2 - (OLD.grade = 2),
+            grade_1 = grade_1 - (OLD.grade = 1)
+        WHERE user_id = OLD.user_id
+          AND day = date(OLD.date, 'unixepoch', '{TASHKENT_OFFSET}')
+          AND topic = OLD.topic;
+
+        DELETE FROM daily_rollup
+        WHERE user_id = OLD.user_id
+          AND day = date(OLD.date, 'unixepoch', '{TASHKENT_OFFSET}')
+          AND topic = OLD.topic
+          AND total = 0;
+    END
+    """,
+]
+
+
+async def _table_exists(db, name):
+    async with db.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ) as cursor:
+        return await cursor.fetchone() is not None
+
+
+async def create_stats_tables(db):
+    """Create the per-student and per-group tables and triggers, backfilling them on first run."""
+    stats_exist = await _table_exists(db, "student_stats")
+
+    for statement in STATS_TABLES + STATS_TRIGGERS:
+        await db.execute(statement)
+
+    if not stats_exist:
+        await rebuild_stats(db)
+
+
+async def create_daily_rollup(db):
+    """Create `daily_rollup` and its triggers, backfilling it on first run.
+
+    Run as a migration after grades.date became epoch seconds: the day
+    column is computed from it and is NULL for the old ISO strings.
+    """
+    rollup_exists = await _table_exists(db, "daily_rollup")
+
+    for statement in ROLLUP_TABLES + ROLLUP_TRIGGERS:
+        await db.execute(statement)
+
+    if not rollup_exists:
+        await rebuild_daily_rollup(db)
+
+
+# Every student's all-time totals, read through idx_grades_user_grade
+REBUILD_STUDENT_STATS = """
+    INSERT INTO student_stats
+        (user_id, total, grade_sum, grade_5, grade_4, grade_3, grade_2, grade_1)
+    SELECT u.user_id,
+           COUNT(g.grade),
+           IFNULL(SUM(g.grade), 0),
+           IFNULL(SUM(g.grade = 5), 0),
+           IFNULL(SUM(g.grade = 4), 0),
+           IFNULL(SUM(g.grade = 3), 0),
+           IFNULL(SUM(g.grade = 2), 0),
+           IFNULL(SUM(g.grade = 1), 0)
+    FROM users u
+    LEFT JOIN grades g ON u.user_id = g.user_id
+    GROUP BY u.user_id
+"""
+
+
+async def rebuild_stats(db):
+    """Recompute both aggregate tables from scratch (first run or repair)."""
+    await db.execute("DELETE FROM student_stats")
+    await db.execute("DELETE FROM group_stats")
+    await db.execute(REBUILD_STUDENT_STATS)
+    await db.execute("""
+        INSERT INTO group_stats
+            (group_name, students, ungraded_students, total, grade_sum,
+             grade_5, grade_4, grade_3, grade_2, grade_1)
+        SELECT u.group_name,
+               COUNT(*),
+               SUM(s.total = 0),
+               SUM(s.total),
+               SUM(s.grade_sum),
+               SUM(s.grade_5),
+               SUM(s.grade_4),
+               SUM(s.grade_3),
+               SUM(s.grade_2),
+               SUM(s.grade_1)
+        FROM users u
+        JOIN student_stats s ON s.user_id = u.user_id
+        GROUP BY u.group_name
+    """)
+
+
+async def rebuild_daily_rollup(db):
+    """Recompute `daily_rollup` from scratch (first run or repair)."""
+    await db.execute("DELETE FROM daily_rollup")
+    await db.execute(f"""
+        INSERT INTO daily_rollup
+            (user_id, day, topic, group_name, total, grade_sum,
+             grade_5, grade_4, grade_3, grade_2, grade_1)
+        SELECT g.user_id,
+               date(g.date, 'unixepoch', '{TASHKENT_OFFSET}'),
+               g.topic,
+               u.group_name,
+               COUNT(*),
+               SUM(g.grade),
+               SUM(g.grade = 5),
+               SUM(g.grade = 4),
+               SUM(g.grade = 3),
+               SUM(g.grade = 2),
+               SUM(g.grade = 1)
+        FROM grades g
+        LEFT JOIN users u ON u.user_id = g.user_id
+        GROUP BY g.user_id, 2, g.topic
+    """)
+
+
+def student_sort_key(row):
+    """Keyset of a row from group_students_query() or student_range_query().
+
+    Both list students by (avg, total, user_id) descending; students without
+    grades have no average and sort last.
+    """
+    avg = -1 if row[2] is None else row[2]
+    return avg, row[1] or 0, row[-1]
+
+
+def group_students_query(group, after=None, limit=-1):
+    """(sql, params) of one group's students with their all-time totals.
+
+    Rows are (full_name, total, avg, grade_5, ..., grade_1, user_id), best
+    average first.  `after` is the student_sort_key() of the last row already
+    read, for keyset pagination; `limit` -1 returns every row.
+    """
+    sort_key = ("IFNULL(ROUND(s.grade_sum * 1.0 / NULLIF(s.total, 0), 1), -1)", "IFNULL(s.total, 0)", "u.user_id")
+    where, params = "u.group_name = ?", (group,)
+    if after is not None:
+        where += f" AND ({', '.join(sort_key)}) < (?, ?, ?)"
+        params += tuple(after)
+    order = ", ".join(f"{column} DESC" for column in sort_key)
+    return f"""
+        SELECT u.full_name,
+               s.total as total_retellings,
+               ROUND(s.grade_sum * 1.0 / NULLIF(s.total, 0), 1) as avg_grade,
+               s.grade_5, s.grade_4, s.grade_3, s.grade_2, s.grade_1,
+               u.user_id
+        FROM users u
+        LEFT JOIN student_stats s ON u.user_id = s.user_id
+        WHERE {where}
+        ORDER BY {order}
+        LIMIT ?
+    """, params + (limit,)
+
+
+# Columns shared by the range queries below; `r` is daily_rollup
+_RANGE_AVG = "ROUND(SUM(r.grade_sum) * 1.0 / SUM(r.total), 1)"
+_RANGE_TOTALS = f"""
+    SUM(r.total),
+    {_RANGE_AVG},
+    SUM(r.grade_5),
+    SUM(r.grade_4),
+    SUM(r.grade_3),
+    SUM(r.grade_2),
+    SUM(r.grade_1)
+"""
+
+
+def _range_filter(start_day, end_day, groups):
+    # `groups` limits the rows to those group names; None means every group
+    where = "r.day BETWEEN ? AND ?"
+    params = (start_day, end_day)
+    if groups is not None:
+        where += f" AND r.group_name IN ({','.join('?' * len(groups))})"
+        params += tuple(groups)
+    return where, params
+
+
+def range_stats_query(start_day, end_day, groups=None):
+    """(sql, params) of get_range_stats()."""
+    where, params = _range_filter(start_day, end_day, groups)
+    return f"""
+        SELECT r.group_name, COUNT(DISTINCT r.user_id), {_RANGE_TOTALS}
+        FROM daily_rollup r
+        WHERE {where}
+        GROUP BY r.group_name
+        ORDER BY 4 DESC
+    """, params
+
+
+async def get_range_stats(db, start_day, end_day, groups=None):
+    """Per-group totals for the inclusive "YYYY-MM-DD" range.
+
+    Rows are (group_name, students, total, avg, grade_5, ..., grade_1).
+    """
+    async with db.execute(*range_stats_query(start_day, end_day, groups)) as cursor:
+        return await cursor.fetchall()
+
+
+def student_range_query(start_day, end_day, group, after=None, limit=-1):
+    """(sql, params) listing one group's students over a range, best average first.
+
+    Rows are (full_name, total, avg, grade_5, ..., grade_1, user_id).  `after`
+    and `limit` page through them as in group_students_query().
+    """
+    where, params = _range_filter(start_day, end_day, (group,))
+    having = ""
+    if after is not None:
+        having = f"HAVING ({_RANGE_AVG}, SUM(r.total), r.user_id) < (?, ?, ?)"
+        params += tuple(after)
+    return f"""
+        SELECT u.full_name, {_RANGE_TOTALS}, r.user_id
+        FROM daily_rollup r
+        JOIN users u ON u.user_id = r.user_id
+        WHERE {where}
+        GROUP BY r.user_id
+        {having}
+        ORDER BY 3 DESC, 2 DESC, r.user_id DESC
+        LIMIT ?
+    """, params + (limit,)
+
+
+async def get_range_totals(db, start_day, end_day, groups=None):
+    """(students, total, avg) over a range; total is 0 when nothing was graded."""
+    where, params = _range_filter(start_day, end_day, groups)
+    async with db.execute(f"""
+        SELECT COUNT(DISTINCT r.user_id),
+               IFNULL(SUM(r.total), 0),
+               ROUND(SUM(r.grade_sum) * 1.0 / SUM(r.total), 1)
+        FROM daily_rollup r
+        WHERE {where}
+    """, params) as cursor:
+        return await cursor.fetchone()
+
+
+async def get_topic_stats(db, start_day, end_day, groups=None, limit=50):
+    """Per-topic totals over a range, most submitted first.
+
+    Rows are (topic, students, total, avg, grade_5, ..., grade_1).
+    """
+    where, params = _range_filter(start_day, end_day, groups)
+    async with db.execute(f"""
+        SELECT r.topic, COUNT(DISTINCT r.user_id), {_RANGE_TOTALS}
+        FROM daily_rollup r
+        WHERE {where}
+        GROUP BY r.topic
+        ORDER BY 3 DESC, r.topic
+        LIMIT ?
+    """, params + (limit,)) as cursor:
+        return await cursor.fetchall()
+
+
+async def get_student_stats(db, user_id):
+    """Return (total, grade_5, grade_4, grade_3, grade_2, grade_1) for one student."""
+    async with db.execute("""
+        SELECT total, grade_5, grade_4, grade_3, grade_2, grade_1
+        FROM student_stats
+        WHERE user_id = ?
+    """, (user_id,)) as cursor:
+        return await cursor.fetchone() or (0, 0, 0, 0, 0, 0)
@@ -0,0 +1,151 @@
+import logging
+import time
+from collections import OrderedDict
+
+
+class SubmissionStore:
+    """Pending (not yet graded) video submissions.
+
+    The `submissions` table is the source of truth so a restart does not lose
+    ungraded videos; a bounded LRU cache in front of it keeps process_grade
+    off the database for recently forwarded videos.  Entries older than
+    `ttl` seconds are treated as gone and purged from both.
+
+    Message ids are only unique within a chat, so a submission is keyed on
+    the student's chat and the video's message id there.
+    """
+
+    def __init__(self, database, max_cached=1000, ttl=14 * 24 * 3600, purge_every=100):
+        self.database = database
+        self.max_cached = max_cached
+        self.ttl = ttl
+        self.purge_every = purge_every
+        self._cache = OrderedDict()
+        self._writes = 0
+
+    def _remember(self, key, submission):
+        self._cache[key] = submission
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached:
+            self._cache.popitem(last=False)
+
+    def _expired(self, submission, now=None):
+        return (now or time.time()) - submission["created_at"] > self.ttl
+
+    async def add(self, chat_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, teacher_id):
+        """`teacher_id` is the chat the video was forwarded to."""
+        key = (int(chat_id), int(message_id))
+        submission = {
+            "user_id": user_id,
+            "topic": topic,
+            "forwarded_msg_id": forwarded_msg_id,
+            "info_msg_id": info_msg_id,
+            "created_at": int(time.time()),
+            "teacher_id": teacher_id,
+        }
+        await self.database.execute("""
+            INSERT INTO submissions
+                (chat_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, created_at, teacher_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (*key, user_id, topic, forwarded_msg_id, info_msg_id,
+              submission["created_at"], teacher_id))
+        self._remember(key, submission)
+
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            await self.purge_expired()
+
+    async def get(self, chat_id, message_id):
+        key = (int(chat_id), int(message_id))
+        submission = self._cache.get(key)
+        if submission is None:
+            row = await self.database.fetchone("""
+                SELECT user_id, topic, forwarded_msg_id, info_msg_id, created_at, teacher_id
+                FROM submissions
+                WHERE chat_id = ? AND message_id = ?
+            """, key)
+            if not row:
+                return None
+            submission = dict(zip(
+                ("user_id", "topic", "forwarded_msg_id", "info_msg_id", "created_at", "teacher_id"),
+                row
+            ))
+
+        if self._expired(submission):
+            await self.remove(*key)
+            return None
+
+        self._remember(key, submission)
+        return submission
+
+    async def remove(self, chat_id, message_id):
+        key = (int(chat_id), int(message_id))
+        self._cache.pop(key, None)
+        await self.database.execute("DELETE FROM submissions WHERE chat_id = ? AND message_id = ?", key)
+
+    def forget(self, keys):
+        """Drop cache entries whose rows were deleted by someone else's transaction.
+
+        `keys` are (chat_id, message_id) pairs.
+        """
+        for chat_id, message_id in keys:
+            self._cache.pop((int(chat_id), int(message_id)), None)
+
+    def _pending_filter(self, teacher_id):
+        where = "s.created_at >= ?"
+        params = (int(time.time()) - self.ttl,)
+        if teacher_id is not None:
+            where += " AND s.teacher_id = ?"
+            params += (teacher_id,)
+        return where, params
+
+    async def count_pending(self, teacher_id=None):
+        """Pending submissions, only those forwarded to `teacher_id` if given."""
+        where, params = self._pending_filter(teacher_id)
+        row = await self.database.fetchone(
+            f"SELECT COUNT(*) FROM submissions s WHERE {where}", params
+        )
+        return row[0]
+
+    def pending_query(self, offset=0, limit=5, teacher_id=None):
+        """(sql, params) of list_pending()."""
+        where, params = self._pending_filter(teacher_id)
+        return f"""
+            SELECT s.chat_id, s.message_id, s.topic, s.created_at, u.full_name, u.group_name
+            FROM submissions s
+            LEFT JOIN users u ON u.user_id = s.user_id
+            WHERE {where}
+            ORDER BY s.created_at, s.chat_id, s.message_id
+            LIMIT ? OFFSET ?
+        """, params + (limit, offset)
+
+    async def list_pending(self, offset=0, limit=5, teacher_id=None):
+        """Oldest pending submissions first, with the student's name and group."""
+        return await self.database.fetchall(*self.pending_query(offset, limit, teacher_id))
+
+    async def purge_expired(self):
+        cutoff = int(time.time()) - self.ttl
+        await self.database.execute("DELETE FROM submissions WHERE created_at < ?", (cutoff,))
+        for key in [k for k, v in self._cache.items() if v["created_at"] < cutoff]:
+            del self._cache[key]
+
+    async def recover(self):
+        """Drop expired rows and warm the cache with the newest pending submissions."""
+        await self.purge_expired()
+        rows = await self.database.fetchall("""
+            SELECT chat_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, created_at, teacher_id
+            FROM submissions
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (self.max_cached,))
+        for chat_id, message_id, user_id, topic, forwarded_msg_id, info_msg_id, created_at, teacher_id in reversed(rows):
+            self._remember((chat_id, message_id), {
+                "user_id": user_id,
+                "topic": topic,
+                "forwarded_msg_id": forwarded_msg_id,
+                "info_msg_id": info_msg_id,
+                "created_at": created_at,
+                "teacher_id": teacher_id,
+            })
+        logging.info("Recovered %d pending submissions", len(rows))
+        return len(rows)
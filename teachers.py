@@ -0,0 +1,84 @@
+import logging
+import time
+
+
+class TeacherRegistry:
+    """Teachers stored in the `teachers` table, cached as an in-memory set.
+
+    `head_id` (TEACHER_ID from the environment) is always a teacher, sees
+    every group and receives submissions from groups nobody else owns.
+    Changes made by another process are picked up within `refresh_interval`
+    seconds by comparing MAX(changed_at), as GroupRegistry does.
+    """
+
+    def __init__(self, database, head_id, refresh_interval=30):
+        self.database = database
+        self.head_id = head_id
+        self.refresh_interval = refresh_interval
+        self._names = {}
+        self._version = None
+        self._checked_at = 0.0
+
+    async def _current_version(self):
+        row = await self.database.fetchone("SELECT MAX(changed_at) FROM teachers")
+        return row[0]
+
+    async def _reload(self):
+        rows = await self.database.fetchall(
+            "SELECT user_id, name FROM teachers WHERE active = 1"
+        )
+        self._names = {user_id: name for user_id, name in rows}
+        self._names.setdefault(self.head_id, None)
+        self._version = await self._current_version()
+        self._checked_at = time.monotonic()
+
+    async def load(self):
+        await self._reload()
+        logging.info("Loaded %d teachers", len(self._names))
+
+    async def _refresh(self):
+        if time.monotonic() - self._checked_at > self.refresh_interval:
+            self._checked_at = time.monotonic()
+            if await self._current_version() != self._version:
+                await self._reload()
+
+    async def is_teacher(self, user_id):
+        await self._refresh()
+        return user_id in self._names
+
+    def is_head(self, user_id):
+        return user_id == self.head_id
+
+    async def route(self, teacher_id):
+        """Chat that receives work for `teacher_id`: the head teacher if unset or removed."""
+        await self._refresh()
+        return teacher_id if teacher_id in self._names else self.head_id
+
+    async def all(self):
+        await self._refresh()
+        return sorted(self._names.items(), key=lambda item: item[0] != self.head_id)
+
+    async def add(self, user_id, name=None):
+        async with self.database.acquire() as db:
+            await db.execute("""
+                INSERT INTO teachers (user_id, name, active, changed_at) VALUES (?, ?, 1, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    name = IFNULL(excluded.name, teachers.name),
+                    active = 1,
+                    changed_at = excluded.changed_at
+            """, (user_id, name, time.time_ns() // 1_000_000))
+            await db.commit()
+        await self._reload()
+
+    async def remove(self, user_id):
+        """Deactivate a teacher; their groups fall back to the head teacher."""
+        async with self.database.acquire() as db:
+            cursor = await db.execute(
+                "UPDATE teachers SET active = 0, changed_at = ? WHERE user_id = ? AND active = 1",
+                (time.time_ns() // 1_000_000, user_id)
+            )
+            changed = cursor.rowcount > 0
+            await db.commit()
+        if changed:
+            await self._reload()
+        return changed
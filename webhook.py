@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import signal
+import time
+import zlib
+
+import aiohttp
+from aiohttp import web
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+
+def add_metrics_route(app, metrics):
+    async def metrics_handler(request):
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app.router.add_get("/metrics", metrics_handler)
+
+
+def create_webhook_app(dp, bot, path="/webhook", secret_token=None, metrics=None):
+    """aiohttp application serving Telegram updates on `path` plus GET /health.
+
+    With `metrics` it also serves them on GET /metrics (Prometheus text format).
+    """
+    app = web.Application()
+    started_at = time.monotonic()
+    if metrics is not None:
+        add_metrics_route(app, metrics)
+
+    async def health(request):
+        return web.json_response({
+            "status": "ok",
+            "uptime": round(time.monotonic() - started_at, 1),
+        })
+
+    app.router.add_get("/health", health)
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def partition_key(update):
+    """User id an update belongs to (chat id or update id when there is none)."""
+    for value in update.values():
+        if not isinstance(value, dict):
+            continue
+        sender = value.get("from") or value.get("user")
+        if sender:
+            return sender["id"]
+        chat = value.get("chat") or (value.get("message") or {}).get("chat")
+        if chat:
+            return chat["id"]
+    return update.get("update_id", 0)
+
+
+def pick_worker(workers, key):
+    # crc32 is stable across processes and restarts, unlike hash()
+    return workers[zlib.crc32(str(key).encode()) % len(workers)]
+
+
+def create_router_app(workers, path="/webhook", secret_token=None, timeout=60):
+    """aiohttp application forwarding each update to the worker owning its user.
+
+    All updates of one user go to the same worker (`workers` are base URLs
+    of webhook-mode bots), so each student is handled in order by a single
+    process.  A worker failure is returned to Telegram as 502, and Telegram
+    retries the update later.
+    """
+    app = web.Application()
+    started_at = time.monotonic()
+    headers = {"Content-Type": "application/json"}
+    if secret_token:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = secret_token
+
+    async def on_startup(app):
+        app["session"] = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout))
+
+    async def on_cleanup(app):
+        await app["session"].close()
+
+    async def forward(request):
+        if secret_token and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret_token:
+            return web.Response(status=401)
+        body = await request.read()
+        try:
+            worker = pick_worker(workers, partition_key(await request.json()))
+        except (ValueError, AttributeError, KeyError, TypeError):
+            return web.Response(status=400)
+        try:
+            async with app["session"].post(f"{worker}{path}", data=body, headers=headers) as response:
+                return web.Response(status=response.status, body=await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error("Worker %s unavailable: %s", worker, e)
+            return web.Response(status=502)
+
+    async def health(request):
+        return web.json_response({
+            "status": "ok",
+            "uptime": round(time.monotonic() - started_at, 1),
+            "workers": len(workers),
+        })
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_get("/health", health)
+    app.router.add_post(path, forward)
+    return app
+
+
+async def start_metrics_server(metrics, host="0.0.0.0", port=9090):
+    """Serve only GET /metrics (for polling mode); returns the runner to clean up."""
+    app = web.Application()
+    add_metrics_route(app, metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info("Metrics server listening on %s:%s/metrics", host, port)
+    return runner
+
+
+async def _serve(app, host, port, on_started=None):
+    """Run `app` until SIGINT/SIGTERM, then shut it down cleanly."""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    try:
+        await site.start()
+        logging.info("Server listening on %s:%s", host, port)
+        if on_started:
+            await on_started()
+        await stop_event.wait()
+        logging.info("Stopping server...")
+    finally:
+        # Stops accepting requests, lets in-flight handlers finish and emits dp shutdown
+        await runner.cleanup()
+
+
+async def _register_webhook(bot, base_url, path, secret_token, allowed_updates):
+    await bot.set_webhook(
+        f"{base_url.rstrip('/')}{path}",
+        secret_token=secret_token,
+        allowed_updates=allowed_updates,
+    )
+    logging.info("Webhook registered at %s%s", base_url.rstrip("/"), path)
+
+
+async def run_webhook(dp, bot, host="0.0.0.0", port=8080, path="/webhook",
+                      base_url=None, secret_token=None, metrics=None):
+    """Serve webhook updates until SIGINT/SIGTERM, then shut down cleanly.
+
+    The webhook is registered with Telegram only when `base_url` is given, so
+    the server can also run locally behind a proxy, a router or a load test.
+    """
+    app = create_webhook_app(dp, bot, path=path, secret_token=secret_token, metrics=metrics)
+
+    async def on_started():
+        if base_url:
+            await _register_webhook(bot, base_url, path, secret_token, dp.resolve_used_update_types())
+
+    await _serve(app, host, port, on_started)
+
+
+async def run_router(bot, workers, host="0.0.0.0", port=8080, path="/webhook",
+                     base_url=None, secret_token=None, allowed_updates=None):
+    """Serve the partitioning router until SIGINT/SIGTERM (see create_router_app)."""
+    app = create_router_app(workers, path=path, secret_token=secret_token)
+
+    async def on_started():
+        logging.info("Routing updates to %d workers", len(workers))
+        if base_url:
+            await _register_webhook(bot, base_url, path, secret_token, allowed_updates)
+
+    await _serve(app, host, port, on_started)